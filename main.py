@@ -0,0 +1,369 @@
+"""
+HTTP server for the notebook chains, one asyncio process for many sessions.
+
+    python main.py                  # http://127.0.0.1:8000
+    curl -N -X POST localhost:8000/chain/stream -H 'content-type: application/json' \\
+         -d '{"count": 3, "topic": "cats"}'
+
+Endpoints (POST, JSON body), every one has a `/stream` variant answering with
+server-sent events (`event: token` ... `event: end`, or `event: error`):
+
+    /chain   {"count": 3, "topic": "relationship"}   03_chains/basic.py chain
+    /rag     {"input": "..."}                        04_rag/rag_basic.py retriever_chain
+    /agent   {"input": "...", "session_id": "...", "agent": "wiki"}
+             the agents of 05_agent_n_tools/agents, built by their `build_agent`:
+             "wiki" (wiki_chat_agent.py), "gc" (gc.py), "google" (google_chat_agent.py)
+
+- a client that disconnects cancels its request, the model call included
+- blocking work (chroma, sqlite caches, sync only tools) runs on one bounded
+  thread pool (`MAX_WORKERS`), at most `MAX_GENERATIONS` requests talk to the
+  model at a time, the rest wait in line
+- on SIGINT/SIGTERM no new connections are accepted, running requests get
+  `SHUTDOWN_GRACE` seconds to finish before they are cancelled
+
+The RAG endpoint serves the index built by `04_rag/rag_basic.py`, run that first.
+The agents keep their tool cache and prompt cache in `output/` of the working
+directory, like the scripts: start the server from `old/` to share them.
+"""
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+ROOT = Path(__file__).resolve().parent / "old"
+AGENTS_DIR = ROOT / "notebooks" / "05_agent_n_tools" / "agents"
+sys.path.insert(0, str(AGENTS_DIR))
+sys.path.insert(0, str(ROOT / "notebooks" / "04_rag"))
+sys.path.insert(0, str(ROOT / "notebooks" / "utils"))
+
+from providers import lazy
+
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "phi3.5")
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "32"))
+MAX_GENERATIONS = int(os.environ.get("MAX_GENERATIONS", "8"))
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "10000"))
+SHUTDOWN_GRACE = float(os.environ.get("SHUTDOWN_GRACE", "30"))
+
+
+#--------------------------------------------
+# chains, built on first use
+#--------------------------------------------
+
+@lazy
+def basic_chain():
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+    from langchain_ollama.llms import OllamaLLM
+
+    prompt = PromptTemplate.from_template("System: you are a funny comedian\nHuman: Tell me {count} dad jokes on topic {topic}")
+    return prompt | OllamaLLM(model=OLLAMA_MODEL) | StrOutputParser()
+
+
+@lazy
+def rag_chain():
+    from langchain.chains.retrieval import create_retrieval_chain
+    from langchain_community.vectorstores import Chroma
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_ollama.embeddings import OllamaEmbeddings
+    from langchain_ollama.llms import OllamaLLM
+
+    from context_packing import create_packed_stuff_documents_chain
+    from embedding_cache import CachedEmbeddings
+    from hybrid_retriever import BM25Index, HybridRetriever
+
+    output = ROOT / "output"
+    embedding = CachedEmbeddings(OllamaEmbeddings(model="nomic-embed-text:latest"),
+                                 str(output / "cache" / "embeddings.sqlite"))
+    db = Chroma(persist_directory=str(output / "db" / "chroma"), embedding_function=embedding)
+    bm25 = BM25Index(str(output / "db" / "bm25" / "index.sqlite"))
+    retriever = HybridRetriever(vectorstore=db, keyword_index=bm25, k=4)
+
+    prompt = ChatPromptTemplate.from_template("""
+Answer the following question based only on the provided context. Think step by step properly before providing answer.
+<context>
+{context}
+</context>
+Question: {input}
+""")
+    doc_chain = create_packed_stuff_documents_chain(OllamaLLM(model=OLLAMA_MODEL), prompt, max_tokens=1500)
+    return create_retrieval_chain(retriever, doc_chain)
+
+
+# "agent" of a request -> script in 05_agent_n_tools/agents
+AGENT_SCRIPTS = {"wiki": "wiki_chat_agent", "gc": "gc", "google": "google_chat_agent"}
+
+
+def load_agent_script(script):
+    # by path and under another name: `import gc` is the stdlib module
+    spec = importlib.util.spec_from_file_location(f"{script}_agent_script", AGENTS_DIR / f"{script}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def shared_executor(script):
+    def build():
+        executor, _, _ = load_agent_script(script).build_agent()
+        # the script's memory is its one user's conversation: here the executor is shared
+        # by all sessions and each request brings its own history
+        return executor.model_copy(update={"memory": None})
+
+    build.__name__ = f"build_{script}"
+    return lazy(build)
+
+
+agent_executors = {name: shared_executor(script) for name, script in AGENT_SCRIPTS.items()}
+
+
+def agent_executor(name):
+    try:
+        return agent_executors[name]
+    except KeyError:
+        raise HTTPException(404, f"unknown agent {name!r}, available: {sorted(agent_executors)}") from None
+
+
+class Sessions:
+    """Chat history per session id, least recently used sessions dropped past `max_sessions`."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, max_messages=40):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self._history = OrderedDict()
+
+    def get(self, session_id):
+        from langchain_core.messages import SystemMessage
+
+        history = self._history.pop(session_id, None)
+        if history is None:
+            history = [SystemMessage("You are an AI assistant that can provide helpful answers using available tools.")]
+        self._history[session_id] = history
+        while len(self._history) > self.max_sessions:
+            self._history.popitem(last=False)
+        return history
+
+    def add(self, session_id, question, answer):
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        history = self.get(session_id)
+        history += [HumanMessage(question), AIMessage(answer)]
+        # keep the system message and the latest turns
+        del history[1:max(1, len(history) - self.max_messages)]
+
+
+sessions = Sessions()
+
+
+#--------------------------------------------
+# app
+#--------------------------------------------
+
+class Server:
+    def __init__(self):
+        self.pool = None
+        self.generations = None
+        self.active = 0
+        self.draining = False
+        self.idle = None
+
+    def enter(self):
+        if self.draining:
+            raise HTTPException(503, "server is shutting down")
+        self.active += 1
+        self.idle.clear()
+
+    def leave(self):
+        self.active -= 1
+        if not self.active:
+            self.idle.set()
+
+
+server = Server()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    loop = asyncio.get_running_loop()
+    # langchain runs sync-only steps with run_in_executor(None, ...), i.e. on this pool
+    server.pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="chain")
+    loop.set_default_executor(server.pool)
+    server.generations = asyncio.Semaphore(MAX_GENERATIONS)
+    server.idle = asyncio.Event()
+    server.idle.set()
+    yield
+    server.draining = True
+    try:
+        await asyncio.wait_for(server.idle.wait(), SHUTDOWN_GRACE)
+    except asyncio.TimeoutError:
+        pass
+    server.pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="langchain basics", lifespan=lifespan)
+
+
+async def build(get):
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, get)
+    except ImportError as e:
+        raise HTTPException(503, f"missing dependency: {e.name or e}")
+
+
+async def until_disconnected(request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(0.5)
+
+
+async def run(request, coro):
+    """Awaits `coro`, cancelling it when the client goes away."""
+    server.enter()
+    try:
+        async with server.generations:
+            task = asyncio.ensure_future(coro)
+            watcher = asyncio.ensure_future(until_disconnected(request))
+            try:
+                await asyncio.wait([task, watcher], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                watcher.cancel()
+            if not task.done():
+                task.cancel()
+                # 499: client closed request, nobody reads it anyway
+                raise HTTPException(499, "client disconnected")
+            return task.result()
+    finally:
+        server.leave()
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream(chunks, on_end=None):
+    """SSE response from an async iterator of (event, data) pairs.
+
+    starlette cancels the generator when the client disconnects, which closes
+    the model stream too.
+    """
+    if server.draining:
+        raise HTTPException(503, "server is shutting down")
+
+    async def events():
+        # counted from the first read of the body: a response that is never sent
+        # (client gone before it started) must not keep the shutdown waiting
+        try:
+            server.enter()
+        except HTTPException as e:  # shutdown began after the response was created
+            yield sse("error", {"status": e.status_code, "detail": e.detail})
+            return
+        try:
+            async with server.generations:
+                yield sse("start", {})
+                async for event, data in chunks:
+                    yield sse(event, data)
+                yield sse("end", on_end() if on_end else {})
+        except HTTPException as e:
+            yield sse("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            yield sse("error", {"status": 500, "detail": repr(e)})
+        finally:
+            server.leave()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+class JokeRequest(BaseModel):
+    count: int = 3
+    topic: str
+
+
+class RagRequest(BaseModel):
+    input: str
+
+
+class AgentRequest(BaseModel):
+    input: str
+    session_id: str = "default"
+    agent: str = "wiki"
+
+
+@app.get("/health")
+async def health():
+    return {"active": server.active, "draining": server.draining}
+
+
+@app.post("/chain")
+async def chain(body: JokeRequest, request: Request):
+    chain = await build(basic_chain)
+    return {"answer": await run(request, chain.ainvoke(body.model_dump()))}
+
+
+@app.post("/chain/stream")
+async def chain_stream(body: JokeRequest):
+    async def chunks():
+        chain = await build(basic_chain)
+        async for token in chain.astream(body.model_dump()):
+            yield "token", token
+
+    return stream(chunks())
+
+
+@app.post("/rag")
+async def rag(body: RagRequest, request: Request):
+    chain = await build(rag_chain)
+    res = await run(request, chain.ainvoke({"input": body.input}))
+    return {"answer": res["answer"], "sources": [doc.metadata for doc in res["context"]]}
+
+
+@app.post("/rag/stream")
+async def rag_stream(body: RagRequest):
+    async def chunks():
+        chain = await build(rag_chain)
+        async for part in chain.astream({"input": body.input}):
+            if "context" in part:
+                yield "sources", [doc.metadata for doc in part["context"]]
+            if "answer" in part:
+                yield "token", part["answer"]
+
+    return stream(chunks())
+
+
+@app.post("/agent")
+async def agent(body: AgentRequest, request: Request):
+    executor = await build(agent_executor(body.agent))
+    res = await run(request, executor.ainvoke({"input": body.input, "chat_history": sessions.get(body.session_id)}))
+    sessions.add(body.session_id, body.input, res["output"])
+    return {"answer": res["output"]}
+
+
+@app.post("/agent/stream")
+async def agent_stream(body: AgentRequest):
+    async def chunks():
+        executor = await build(agent_executor(body.agent))
+        inputs = {"input": body.input, "chat_history": sessions.get(body.session_id)}
+        # the agent streams steps, not tokens: tool calls, their results, then the answer
+        async for step in executor.astream(inputs):
+            for action in step.get("actions", []):
+                yield "action", {"tool": action.tool, "input": action.tool_input}
+            for result in step.get("steps", []):
+                yield "observation", {"tool": result.action.tool, "output": str(result.observation)}
+            if "output" in step:
+                sessions.add(body.session_id, body.input, step["output"])
+                yield "token", step["output"]
+
+    return stream(chunks())
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.environ.get("HOST", "127.0.0.1"), port=int(os.environ.get("PORT", "8000")),
+                timeout_graceful_shutdown=int(SHUTDOWN_GRACE), timeout_keep_alive=30)
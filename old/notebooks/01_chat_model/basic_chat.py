@@ -1,6 +1,14 @@
 from langchain_ollama.chat_models import ChatOllama
 from langchain_core.prompts.chat import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, AIMessage, HumanMessage
+import os
+import sys
+
+# shared helpers live in notebooks/utils
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from stream_metrics import StreamMetrics
+from rolling_history import RollingHistory
+from stream_render import render_stream
 
 model = ChatOllama(model='phi3.5')
 
@@ -16,17 +24,26 @@ model = ChatOllama(model='phi3.5')
 # res.content
 
 
-messages = [
-    SystemMessage("You a person who thinks both positive and negative sides critically before saying anything."),
-]
+# time to first token, tokens/sec, ... of every answer, summary printed on exit
+metrics = StreamMetrics()
+
+# messages = [
+#     SystemMessage("You a person who thinks both positive and negative sides critically before saying anything."),
+# ]
+# the whole list was sent every turn, so prompts (and latency) grew with the session:
+# keep the latest turns under a token budget, older ones are summarized in the background
+history = RollingHistory(model, "You a person who thinks both positive and negative sides critically before saying anything.", max_tokens=2000)
 
 while True:
     user = input(":>> ")
     if user.lower() == "exit":
+        print(metrics.summary())
+        history.close()
         break
-    messages.append(HumanMessage(user))
+    history.add(HumanMessage(user))
     print("B>>",end=' ')
-    for chunk in model.stream(messages):
-        print( chunk.content, end='', flush=True)
-    messages.append(AIMessage(chunk.content))
+    # tokens are printed in small bursts instead of one flush per token
+    answer = render_stream(metrics.measure(model.stream(history.messages()), model=model.model),
+                           lambda new: print(new, end='', flush=True), delta=True, interval=0.03)
+    history.add(AIMessage(answer))  # the whole answer, not just the last chunk
     print()  # for a new line after the response is complete
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Token bounded chat history with a running summary.
+
+Keeps the system message plus the most recent turns under `max_tokens`. Once
+the window grows past the budget, the oldest turns are handed to a background
+thread which folds them into a running summary (one extra model call, not on
+the path of the next answer). Until the summary is ready those turns are
+still sent as they are, so nothing drops out of the conversation (unless
+turns come in faster than summaries: past twice the budget they are left out
+until their summary is done). While summarizing fails, at most twice the
+budget waits for a summary; older turns are dropped (counted in `dropped`).
+
+    history = RollingHistory(model, "You are a helpful assistant.", max_tokens=2000)
+    history.add(HumanMessage(user))
+    answer = ""
+    for chunk in model.stream(history.messages()):
+        answer += chunk.content
+    history.add(AIMessage(answer))
+
+Token counts are kept per message (counted once, when added), so building the
+prompt costs the same at turn 5 and turn 500. The default counter is ~4
+characters per token; pass `count_tokens=model.get_num_tokens` or a real
+tokenizer for exact numbers.
+"""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+SUMMARY_PROMPT = """Progressively summarize the conversation below, adding onto the previous summary.
+Keep names, numbers, decisions and open questions. Answer with the new summary only.
+
+Previous summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+MESSAGE_OVERHEAD = 4  # role and separators of one message
+
+logger = logging.getLogger(__name__)
+
+
+def approx_tokens(text):
+    return (len(text) + 3) // 4
+
+
+class RollingHistory:
+    def __init__(self, model, system, max_tokens=2000, min_messages=4, summarizer=None,
+                 count_tokens=approx_tokens):
+        """
+        max_tokens: budget of the recent window (system message and summary not included)
+        min_messages: latest messages never summarized away, even when over budget
+        summarizer: model writing the summary, defaults to `model`
+        """
+        self.system = system
+        self.max_tokens = max_tokens
+        self.min_messages = min_messages
+        self.summarizer = summarizer or model
+        self.count_tokens = count_tokens
+
+        self.summary = ""
+        self.summary_error = None  # exception of the last failed summary, None once one succeeds
+        self.dropped = 0  # messages given up on without a summary
+        self._window = deque()  # (message, tokens)
+        self._window_tokens = 0
+        self._folding = []  # messages being summarized right now
+        self._folding_tokens = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+        self._task = None
+
+    @property
+    def tokens(self):
+        """Tokens held: recent window, turns being summarized and the summary."""
+        return self._window_tokens + self._folding_tokens + (self.count_tokens(self.summary) if self.summary else 0)
+
+    def add(self, message):
+        tokens = self.count_tokens(message.content) + MESSAGE_OVERHEAD
+        with self._lock:
+            self._window.append((message, tokens))
+            self._window_tokens += tokens
+            if self._window_tokens > self.max_tokens and self._task is None:
+                self._start_fold()
+
+    def _start_fold(self):
+        # bring the window down to half the budget so we do not summarize every turn
+        target = self.max_tokens // 2
+        while len(self._window) > self.min_messages and self._window_tokens > target:
+            message, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+            self._folding.append(message)
+            self._folding_tokens += tokens
+        # start on a user turn, a window opening with an answer confuses small models
+        while len(self._window) > self.min_messages and not isinstance(self._window[0][0], HumanMessage):
+            message, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+            self._folding.append(message)
+            self._folding_tokens += tokens
+        # summaries keep failing: drop the oldest waiting messages, or they and the
+        # summary prompt grow with every turn
+        dropped = 0
+        while self._folding_tokens > 2 * self.max_tokens and len(self._folding) > 1:
+            message = self._folding.pop(0)
+            self._folding_tokens -= self.count_tokens(message.content) + MESSAGE_OVERHEAD
+            dropped += 1
+        if dropped:
+            self.dropped += dropped
+            logger.warning("summarizing is behind, dropped the %d oldest messages", dropped)
+        if self._folding:
+            self._task = self._pool.submit(self._fold, self.summary, list(self._folding))
+
+    def _fold(self, summary, messages):
+        lines = "\n".join(f"{m.type}: {m.content}" for m in messages)
+        try:
+            res = self.summarizer.invoke(SUMMARY_PROMPT.format(summary=summary or "(none)", lines=lines))
+        except Exception as e:
+            # a library class does not write to the chat's stdout, the app decides what to show
+            logger.warning("summarizing failed, keeping the messages: %s", e)
+            with self._lock:
+                self.summary_error = e
+                self._task = None
+            return
+        new_summary = getattr(res, "content", res).strip()
+        with self._lock:
+            self.summary = new_summary
+            self.summary_error = None
+            del self._folding[:len(messages)]
+            self._folding_tokens = sum(self.count_tokens(m.content) + MESSAGE_OVERHEAD for m in self._folding)
+            self._task = None
+            if self._window_tokens > self.max_tokens:
+                self._start_fold()
+
+    def messages(self):
+        with self._lock:
+            system = self.system
+            if self.summary:
+                system += f"\n\nSummary of the earlier conversation:\n{self.summary}"
+            if self._folding_tokens + self._window_tokens <= 2 * self.max_tokens:
+                return [SystemMessage(system), *self._folding, *(m for m, _ in self._window)]
+            # summaries are behind: newest messages that fit, the rest comes back via the summary
+            recent, used = [], 0
+            for message, tokens in reversed(self._window):
+                if used + tokens > 2 * self.max_tokens and len(recent) >= self.min_messages:
+                    break
+                recent.append(message)
+                used += tokens
+            return [SystemMessage(system), *reversed(recent)]
+
+    def wait(self):
+        """Blocks until a running summary is done (e.g. before saving the history)."""
+        # a finished summary may start the next one
+        while (task := self._task) is not None:
+            task.result()
+
+    def clear(self):
+        self.wait()
+        with self._lock:
+            self.summary = ""
+            self.summary_error = None
+            self.dropped = 0
+            self._window.clear()
+            self._window_tokens = 0
+            self._folding.clear()
+            self._folding_tokens = 0
+
+    def close(self):
+        self._pool.shutdown(wait=True)
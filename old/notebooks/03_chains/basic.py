@@ -1,8 +1,15 @@
 from langchain_core.output_parsers import StrOutputParser
 from langchain_ollama.llms import OllamaLLM
-from langchain_core.prompts import PromptTemplate 
+from langchain_core.prompts import PromptTemplate
 
-model = OllamaLLM(model='phi3.5')
+# persistent response cache: same model + params + rendered prompt -> no new generation
+from llm_cache import SQLiteLRUCache, with_stream_cache
+
+cache = SQLiteLRUCache("output/cache/llm.sqlite", max_entries=100_000)
+
+# model = OllamaLLM(model='phi3.5', cache=cache)
+# the cache key langchain builds for ollama has no model name or temperature in it
+model = cache.attach(OllamaLLM(model='phi3.5'))
 
 prompt = PromptTemplate.from_template("System: you are a funny comedian\nHuman: Tell me {count} dad jokes on topic {topic}")
 
@@ -10,3 +17,23 @@ chain = prompt | model | StrOutputParser()
 
 res = chain.invoke({'count':3,'topic':'relationship'})
 print(res)
+
+# streaming: chunks of a cached answer are replayed
+stream_chain = prompt | with_stream_cache(model, cache) | StrOutputParser()
+
+for chunk in stream_chain.stream({'count':3,'topic':'relationship'}):
+    print(chunk, end='', flush=True)
+print()
+
+# many concurrent callers: micro batch them in front of the model, at most
+# max_in_flight requests hit ollama at once (match OLLAMA_NUM_PARALLEL)
+from micro_batch import MicroBatcher
+
+batched_model = MicroBatcher(model, max_batch_size=8, max_wait_ms=10, max_in_flight=4, slo_ms=30_000)
+batched_chain = prompt | batched_model | StrOutputParser()
+
+topics = ['cats', 'coffee', 'mondays', 'gym', 'cooking', 'traffic']
+for topic, res in zip(topics, batched_chain.batch([{'count':1,'topic':t} for t in topics])):
+    print(topic, '->', res)
+print(batched_model.stats())
+batched_model.close()
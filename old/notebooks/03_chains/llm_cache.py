@@ -0,0 +1,228 @@
+"""
+Persistent LLM response cache.
+
+`SQLiteLRUCache` is a LangChain `BaseCache`: `cache.attach(model)` returns
+the model with the cache set, and `invoke`/`batch` results are reused for the
+same model, parameters and rendered prompt. The sqlite file is opened in WAL
+mode with a busy timeout, so several processes can share it, and least
+recently used entries are evicted past `max_entries` / `max_bytes`.
+
+Use `attach` rather than `OllamaLLM(cache=cache)`: the key LangChain hands to
+a cache comes from `dict()` / `_get_llm_string()`, which for the ollama
+models is the same for every model name and temperature, so answers of one
+model would come back from another. `attach` adds all the model's fields.
+
+LangChain does not consult the cache for `stream()`, so `with_stream_cache`
+wraps a model to record the streamed chunks and replay them on a hit:
+
+    cache = SQLiteLRUCache("output/cache/llm.sqlite")
+    model = cache.attach(OllamaLLM(model="phi3.5"))
+    chain = prompt | with_stream_cache(model, cache) | StrOutputParser()
+
+Only worth it for deterministic settings (e.g. temperature=0) or when
+repeating the exact same answer is what you want.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import BaseCache
+from langchain_core.language_models import BaseChatModel
+from langchain_core.load import dumps, loads
+from langchain_core.runnables import Runnable
+
+
+# fields that do not change the answer
+NOT_PARAMS = {"cache", "callbacks", "callback_manager", "verbose", "metadata", "tags"}
+
+
+def _key(kind, prompt, llm_string):
+    digest = hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+    return f"{kind}:{digest}"
+
+
+def llm_string(model, stop=None, **kwargs):
+    """Model class, every parameter of `model` and the call's stop / kwargs, as one string."""
+    params = model.model_dump(exclude=NOT_PARAMS)
+    return json.dumps({"model": type(model).__qualname__, "params": params, "stop": stop, "kwargs": kwargs},
+                      sort_keys=True, default=repr)
+
+
+class SQLiteLRUCache(BaseCache):
+    def __init__(self, path, max_entries=100_000, max_bytes=512 * 1024 * 1024, touch_every=60.0):
+        """
+        touch_every: seconds between last-used updates of an entry, keeps hits
+                     from turning into a write per call when many processes share the file
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.touch_every = touch_every
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with _Transaction(self._conn()) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+
+    def _conn(self):
+        # one connection per thread, sqlite connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key):
+        # reads run in autocommit mode and never take the write lock
+        conn = self._conn()
+        row = conn.execute("SELECT value, last_used FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.touch_every:
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            return loads(row[0])
+
+    def _put(self, key, value):
+        data = dumps(value)
+        with _Transaction(self._conn()) as conn:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                         (key, data, len(data), time.time()))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # free 10% below the limits in one go
+        drop_count = max(0, count - int(self.max_entries * 0.9))
+        drop_bytes = max(0, total - int(self.max_bytes * 0.9))
+        stale, freed = [], 0
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if len(stale) >= drop_count and freed >= drop_bytes:
+                break
+            stale.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def lookup(self, prompt, llm_string):
+        return self._get(_key("gen", prompt, llm_string))
+
+    def update(self, prompt, llm_string, return_val):
+        self._put(_key("gen", prompt, llm_string), return_val)
+
+    def lookup_stream(self, prompt, llm_string):
+        return self._get(_key("stream", prompt, llm_string))
+
+    def update_stream(self, prompt, llm_string, chunks):
+        self._put(_key("stream", prompt, llm_string), chunks)
+
+    def clear(self, **kwargs):
+        with _Transaction(self._conn()) as conn:
+            conn.execute("DELETE FROM responses")
+
+    def attach(self, model):
+        """Copy of `model` using this cache, keyed by all of its parameters."""
+        return model.model_copy(update={"cache": _ModelCache(self, llm_string(model))})
+
+
+class _ModelCache(BaseCache):
+    """View of a `SQLiteLRUCache` for one model: its parameters go into every key."""
+
+    def __init__(self, cache, model_string):
+        self.cache = cache
+        self.model_string = model_string
+
+    def lookup(self, prompt, llm_string):
+        return self.cache.lookup(prompt, f"{self.model_string}\0{llm_string}")
+
+    def update(self, prompt, llm_string, return_val):
+        self.cache.update(prompt, f"{self.model_string}\0{llm_string}", return_val)
+
+    def clear(self, **kwargs):
+        self.cache.clear(**kwargs)
+
+
+class _Transaction:
+    """`with` block running as one IMMEDIATE transaction (write lock taken up front)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class StreamCachedModel(Runnable):
+    """Model wrapper replaying cached stream chunks; invoke goes straight to the model."""
+
+    def __init__(self, model, cache):
+        self.model = model
+        self.cache = cache
+
+    @property
+    def InputType(self):
+        return self.model.InputType
+
+    @property
+    def OutputType(self):
+        return self.model.OutputType
+
+    def _cache_key(self, input, stop=None, **kwargs):
+        value = self.model._convert_input(input)
+        # not _get_llm_string() / dict(): both leave the model name and temperature out for ollama
+        prompt = dumps(value.to_messages()) if isinstance(self.model, BaseChatModel) else value.to_string()
+        return prompt, llm_string(self.model, stop, **kwargs)
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.model.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self.model.ainvoke(input, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        prompt, llm_string = self._cache_key(input, **kwargs)
+        cached = self.cache.lookup_stream(prompt, llm_string)
+        if cached is not None:
+            yield from cached
+            return
+        chunks = []
+        for chunk in self.model.stream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        # only complete streams are stored
+        self.cache.update_stream(prompt, llm_string, chunks)
+
+    async def astream(self, input, config=None, **kwargs):
+        prompt, llm_string = self._cache_key(input, **kwargs)
+        cached = self.cache.lookup_stream(prompt, llm_string)
+        if cached is not None:
+            for chunk in cached:
+                yield chunk
+            return
+        chunks = []
+        async for chunk in self.model.astream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.update_stream(prompt, llm_string, chunks)
+
+
+def with_stream_cache(model, cache):
+    """`model` with `cache` attached (invoke / batch) and its streams replayed from `cache`."""
+    return StreamCachedModel(cache.attach(model), cache)
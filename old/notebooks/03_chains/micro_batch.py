@@ -0,0 +1,235 @@
+"""
+Micro-batching scheduler in front of a model runnable.
+
+Concurrent `invoke`/`ainvoke` calls are queued, collected for up to
+`max_wait_ms` (or until `max_batch_size` are waiting) and dispatched together
+with at most `max_in_flight` requests running against the model, e.g. the
+`OLLAMA_NUM_PARALLEL` of the server.
+
+- fair queuing: one queue per session (`config["metadata"]["session_id"]` by
+  default), batches are filled round robin so one busy client can not starve
+  the others
+- backpressure: once `max_queue` requests wait, callers block (and get a
+  TimeoutError after `queue_timeout` seconds)
+- latency SLO: with `slo_ms` the collection window shrinks by the observed
+  model time, so no request waits for batch mates longer than the SLO allows
+
+Ollama has no multi-prompt endpoint, so by default the requests of a batch
+are sent concurrently; `native_batch=True` hands the whole batch to
+`runnable.batch()` for backends that batch for real.
+
+    batched_model = MicroBatcher(model, max_batch_size=8, max_wait_ms=10, max_in_flight=4)
+    chain = prompt | batched_model | StrOutputParser()
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain_core.runnables import Runnable
+
+
+class _Request:
+    __slots__ = ("input", "config", "kwargs", "future", "enqueued")
+
+    def __init__(self, input, config, kwargs):
+        self.input = input
+        self.config = config
+        self.kwargs = kwargs  # e.g. stop=[...], passed on to the model call
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+def session_key(input, config):
+    return ((config or {}).get("metadata") or {}).get("session_id", "default")
+
+
+class MicroBatcher(Runnable):
+    def __init__(self, runnable, max_batch_size=8, max_wait_ms=10, max_in_flight=4,
+                 max_queue=256, queue_timeout=30.0, slo_ms=None, key_fn=session_key,
+                 native_batch=False):
+        self.runnable = runnable
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.slo = slo_ms / 1000 if slo_ms else None
+        self.key_fn = key_fn
+        self.native_batch = native_batch
+
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # session -> deque of _Request
+        self._queued = 0
+        self._closed = False
+        self._slots = threading.Semaphore(max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="micro-batch")
+        self._service_time = 0.0  # moving average of one model call
+        self._latencies = deque(maxlen=1000)
+        self._batches = 0
+        self._requests = 0
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True,
+                                            name="micro-batch-dispatcher")
+        self._dispatcher.start()
+
+    @property
+    def InputType(self):
+        return self.runnable.InputType
+
+    @property
+    def OutputType(self):
+        return self.runnable.OutputType
+
+    # ---- queueing ------------------------------------------------------
+
+    def _submit(self, input, config, kwargs):
+        request = _Request(input, config, kwargs)
+        key = self.key_fn(input, config)
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queued < self.max_queue or self._closed,
+                                       timeout=self.queue_timeout):
+                raise TimeoutError(f"MicroBatcher queue is full ({self.max_queue} requests waiting)")
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queues.setdefault(key, deque()).append(request)
+            self._queued += 1
+            self._cond.notify_all()
+        return request.future
+
+    def _take(self, size):
+        """Round robin over sessions; caller holds the lock."""
+        batch = []
+        while self._queues and len(batch) < size:
+            key, queue = next(iter(self._queues.items()))
+            batch.append(queue.popleft())
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+        self._queued -= len(batch)
+        self._cond.notify_all()
+        return batch
+
+    def _window_deadline(self):
+        oldest = min(queue[0].enqueued for queue in self._queues.values())
+        wait = self.max_wait
+        if self.slo is not None:
+            # leave the model enough of the SLO to answer
+            wait = min(wait, max(0.0, self.slo - self._service_time))
+        return oldest + wait
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queued or self._closed)
+                if self._closed and not self._queued:
+                    return
+                deadline = self._window_deadline()
+                while self._queued < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            # wait for model capacity outside the lock; waiting callers keep queueing
+            self._slots.acquire()
+            taken = 1
+            while taken < self.max_batch_size and self._slots.acquire(blocking=False):
+                taken += 1
+            with self._cond:
+                batch = self._take(taken)
+            for _ in range(taken - len(batch)):
+                self._slots.release()
+            if batch:
+                self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        self._batches += 1
+        self._requests += len(batch)
+        if self.native_batch:
+            self._pool.submit(self._run_batch, batch)
+        else:
+            for request in batch:
+                self._pool.submit(self._run_one, request)
+
+    # ---- execution -----------------------------------------------------
+
+    def _finish(self, request, started, output=None, error=None):
+        now = time.monotonic()
+        self._service_time = 0.8 * self._service_time + 0.2 * (now - started)
+        self._latencies.append(now - request.enqueued)
+        self._slots.release()
+        if error is not None:
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(output)
+
+    def _run_one(self, request):
+        started = time.monotonic()
+        try:
+            output = self.runnable.invoke(request.input, request.config, **request.kwargs)
+        except BaseException as e:
+            self._finish(request, started, error=e)
+        else:
+            self._finish(request, started, output)
+
+    def _run_batch(self, batch):
+        # batch() takes one set of kwargs for all inputs: one call per distinct set
+        # (kwargs like stop=[...] are not hashable, so compared, not keyed)
+        groups = []
+        for request in batch:
+            for kwargs, requests in groups:
+                if kwargs == request.kwargs:
+                    requests.append(request)
+                    break
+            else:
+                groups.append((request.kwargs, [request]))
+
+        for kwargs, requests in groups:
+            started = time.monotonic()
+            try:
+                outputs = self.runnable.batch([r.input for r in requests], [r.config for r in requests],
+                                              return_exceptions=True, **kwargs)
+            except BaseException as e:
+                outputs = [e] * len(requests)
+            for request, output in zip(requests, outputs):
+                if isinstance(output, BaseException):
+                    self._finish(request, started, error=output)
+                else:
+                    self._finish(request, started, output)
+
+    # ---- Runnable api --------------------------------------------------
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._submit(input, config, kwargs).result()
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        # queueing may block on backpressure, keep that off the event loop
+        future = await asyncio.to_thread(self._submit, input, config, kwargs)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+        return {
+            "requests": self._requests,
+            "batches": self._batches,
+            "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+            "queued": self._queued,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "model_ms": self._service_time * 1000,
+        }
+
+    def close(self, wait=True):
+        """Stops accepting requests; queued ones are still served."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            self._dispatcher.join()
+            self._pool.shutdown(wait=True)
@@ -0,0 +1,48 @@
+"""
+Two models answering the same prompt must not share cache entries.
+
+    python -m pytest notebooks/03_chains/test_llm_cache.py
+
+`EchoLLM` is offline and, like `OllamaLLM`, has a `dict()` without its model
+name, so the key LangChain builds on its own is the same for both models.
+"""
+from langchain_core.language_models import LLM
+
+from llm_cache import SQLiteLRUCache, with_stream_cache
+
+
+class EchoLLM(LLM):
+    model: str
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "echo"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        return f"{self.model}: {prompt}"
+
+
+def test_same_langchain_key():
+    # the collision this cache has to work around
+    assert EchoLLM(model="phi3.5").dict() == EchoLLM(model="llama3", temperature=0.9).dict()
+
+
+def test_invoke_not_shared(tmp_path):
+    cache = SQLiteLRUCache(str(tmp_path / "llm.sqlite"))
+    phi = cache.attach(EchoLLM(model="phi3.5"))
+    llama = cache.attach(EchoLLM(model="llama3", temperature=0.9))
+    assert phi.invoke("tell a joke") == "phi3.5: tell a joke"
+    assert llama.invoke("tell a joke") == "llama3: tell a joke"
+    # and each one is still cached
+    assert phi.invoke("tell a joke") == "phi3.5: tell a joke"
+
+
+def test_stream_not_shared(tmp_path):
+    cache = SQLiteLRUCache(str(tmp_path / "llm.sqlite"))
+    phi = with_stream_cache(EchoLLM(model="phi3.5"), cache)
+    llama = with_stream_cache(EchoLLM(model="llama3", temperature=0.9), cache)
+    assert phi._cache_key("tell a joke") != llama._cache_key("tell a joke")
+    assert phi._cache_key("tell a joke", stop=["\n"]) != phi._cache_key("tell a joke")
+    assert "".join(phi.stream("tell a joke")) == "phi3.5: tell a joke"
+    assert "".join(llama.stream("tell a joke")) == "llama3: tell a joke"
@@ -0,0 +1,174 @@
+"""
+Async web page loader, a concurrent replacement for `WebBaseLoader`.
+
+- one pooled `httpx.AsyncClient` (keep-alive connections) for every request
+- at most `per_host_limit` requests in flight per host
+- conditional GET: ETag / Last-Modified of every page whose document was
+  handed out are stored in `validators_path`; pages answering 304 Not
+  Modified are skipped and listed in `loader.skipped`
+- `bs_kwargs` (e.g. a `SoupStrainer`) and `bs_get_text_kwargs` work like in
+  `WebBaseLoader`, and documents carry the same metadata
+
+    loader = AsyncWebLoader(urls, bs_kwargs=dict(parse_only=bs4.SoupStrainer(class_=[...])),
+                            validators_path="output/cache/web_validators.json")
+    docs = loader.load()            # or: await loader.aload()
+    # skipped pages are unchanged, not gone: keep their chunks in the index
+    sync_documents(db, docs, splitter, persist_directory, keep_sources=loader.skipped)
+
+A load that fails stores no validators (`aload`), or only those of the
+documents already yielded (`alazy_load`), so a page is never marked as seen
+while its document was thrown away.
+"""
+import asyncio
+import json
+import os
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+from langchain_community.document_loaders.web_base import _build_metadata
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+
+class AsyncWebLoader(BaseLoader):
+    def __init__(self, web_paths, bs_kwargs=None, bs_get_text_kwargs=None,
+                 per_host_limit=4, max_connections=64, timeout=30.0,
+                 validators_path=None, headers=None, client=None, continue_on_failure=False):
+        self.web_paths = list(web_paths)
+        self.bs_kwargs = bs_kwargs or {}
+        self.bs_get_text_kwargs = bs_get_text_kwargs or {}
+        self.per_host_limit = per_host_limit
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.validators_path = validators_path
+        self.headers = headers or {"User-Agent": os.environ.get("USER_AGENT", "langchain-basic")}
+        self.client = client
+        self.continue_on_failure = continue_on_failure
+        self.skipped = []  # urls answering 304 during the last load
+        self.failed = {}   # url -> error of the last load (with continue_on_failure)
+
+    def _load_validators(self):
+        if self.validators_path and os.path.exists(self.validators_path):
+            with open(self.validators_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_validators(self, validators):
+        if not self.validators_path:
+            return
+        os.makedirs(os.path.dirname(self.validators_path) or ".", exist_ok=True)
+        tmp = self.validators_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(validators, f)
+        os.replace(tmp, self.validators_path)
+
+    def _parse(self, url, html):
+        soup = BeautifulSoup(html, "html.parser", **self.bs_kwargs)
+        text = soup.get_text(**self.bs_get_text_kwargs)
+        return Document(page_content=text, metadata=_build_metadata(soup, url))
+
+    async def _fetch(self, client, url, limits, validators):
+        """(document, validators of the response), document is None for 304"""
+        headers = {}
+        known = validators.get(url, {})
+        if "etag" in known:
+            headers["If-None-Match"] = known["etag"]
+        if "last_modified" in known:
+            headers["If-Modified-Since"] = known["last_modified"]
+
+        async with limits[urlsplit(url).netloc]:
+            response = await client.get(url, headers=headers)
+        if response.status_code == 304:
+            self.skipped.append(url)
+            return None, None
+        response.raise_for_status()
+
+        # parsing is CPU work, keep it off the event loop
+        doc = await asyncio.to_thread(self._parse, url, response.text)
+        fresh = {}
+        if etag := response.headers.get("etag"):
+            fresh["etag"] = etag
+        if last_modified := response.headers.get("last-modified"):
+            fresh["last_modified"] = last_modified
+        return doc, fresh
+
+    async def _run(self, on_doc):
+        """Calls `on_doc(index, url, doc, validators)` per fetched page, saves nothing."""
+        self.skipped, self.failed = [], {}
+        validators = self._load_validators()
+        limits = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+        client = self.client or httpx.AsyncClient(
+            headers=self.headers, timeout=self.timeout, follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_connections))
+
+        async def fetch(index, url):
+            try:
+                doc, fresh = await self._fetch(client, url, limits, validators)
+            except (httpx.HTTPError, ValueError) as e:
+                if not self.continue_on_failure:
+                    raise
+                self.failed[url] = e
+                return
+            if doc is not None:
+                await on_doc(index, url, doc, fresh)
+
+        tasks = [asyncio.ensure_future(fetch(i, url)) for i, url in enumerate(self.web_paths)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # first failure wins, stop the requests still in flight
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            if self.client is None:
+                await client.aclose()
+
+    def _remember(self, delivered):
+        """Stores the validators of the pages whose documents reached the caller."""
+        if delivered:
+            self._save_validators({**self._load_validators(), **delivered})
+
+    async def alazy_load(self):
+        """Yields documents as soon as their page is fetched (completion order)."""
+        done = asyncio.Queue()
+        delivered = {}
+
+        async def on_doc(index, url, doc, fresh):
+            await done.put((url, doc, fresh))
+
+        task = asyncio.create_task(self._run(on_doc))
+        task.add_done_callback(lambda _: done.put_nowait(None))
+        try:
+            while (item := await done.get()) is not None:
+                url, doc, fresh = item
+                delivered[url] = fresh  # handed out by the yield, even if the consumer stops right after
+                yield doc
+            await task
+        finally:
+            # first: awaiting below may itself be cancelled (generator closed at loop shutdown)
+            self._remember(delivered)
+            if not task.done():  # consumer stopped early
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def aload(self):
+        """Fetches every page concurrently, returns documents in `web_paths` order."""
+        docs = {}
+        fetched = {}
+
+        async def on_doc(index, url, doc, fresh):
+            docs[index] = doc
+            fetched[url] = fresh
+
+        await self._run(on_doc)
+        # only after success: a failed load returns no documents, so nothing was seen
+        self._remember(fetched)
+        return [docs[i] for i in sorted(docs)]
+
+    def lazy_load(self):
+        # from a notebook with a running event loop use `await loader.aload()` instead
+        yield from asyncio.run(self.aload())
@@ -0,0 +1,79 @@
+"""
+Benchmark: RecursiveCharacterTextSplitter vs FastRecursiveSplitter.
+
+Checks both produce the same chunks, then reports time and peak allocations
+(tracemalloc) for splitting a large generated text or a given file.
+
+    python notebooks/04_rag/bench_fast_splitter.py --mb 8
+    python notebooks/04_rag/bench_fast_splitter.py --file data/gen_ai.txt
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from fast_splitter import FastRecursiveSplitter
+
+
+def make_text(size, seed=0):
+    """Paragraphs of sentences with the odd very long line/word, ~`size` chars."""
+    rng = random.Random(seed)
+    words = ("the model attends to every token in the sequence and learns which "
+             "positions matter for the next prediction").split()
+    parts, total = [], 0
+    while total < size:
+        kind = rng.random()
+        if kind < 0.02:
+            part = "x" * rng.randint(1000, 5000)  # no separators at all
+        elif kind < 0.05:
+            part = " ".join(rng.choice(words) for _ in range(rng.randint(400, 900)))
+        else:
+            lines = [" ".join(rng.choice(words) for _ in range(rng.randint(5, 30)))
+                     for _ in range(rng.randint(1, 8))]
+            part = "\n".join(lines)
+        parts.append(part)
+        total += len(part) + 2
+    return "\n\n".join(parts)
+
+
+def measure(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    result = fn(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=4)
+    parser.add_argument("--file")
+    parser.add_argument("--chunk-size", type=int, default=1600)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = make_text(int(args.mb * 1024 * 1024))
+
+    original = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    fast = FastRecursiveSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+
+    expected, t_orig, mem_orig = measure(original.split_text, text, args.repeat)
+    chunks, t_fast, mem_fast = measure(fast.split_text, text, args.repeat)
+    _, t_off, mem_off = measure(fast.split_offsets, text, args.repeat)
+
+    print(f"text: {len(text) / 1e6:.1f}M chars, chunks: {len(expected)}, identical: {chunks == expected}")
+    print(f"RecursiveCharacterTextSplitter   {t_orig * 1000:8.1f} ms  peak {mem_orig / 1e6:7.1f} MB")
+    print(f"FastRecursiveSplitter.split_text {t_fast * 1000:8.1f} ms  peak {mem_fast / 1e6:7.1f} MB")
+    print(f"FastRecursiveSplitter offsets    {t_off * 1000:8.1f} ms  peak {mem_off / 1e6:7.1f} MB")
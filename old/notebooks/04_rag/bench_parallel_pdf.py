@@ -0,0 +1,86 @@
+"""
+Benchmark: PyPDFLoader vs ParallelPyPDFLoader on a generated pdf.
+
+    python notebooks/04_rag/bench_parallel_pdf.py --pages 400 --workers 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from langchain_community.document_loaders import PyPDFLoader
+
+from parallel_pdf import ParallelPyPDFLoader
+
+WORDS = ("attention encoder decoder layer head token model sequence position "
+         "training dropout vector query key value softmax residual norm").split()
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(path, pages, lines_per_page=55, seed=0):
+    """Writes a plain text pdf (Helvetica, one content stream per page)."""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for number in range(pages):
+        lines = [f"Page {number + 1}"] + [
+            " ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        body = "BT /F1 10 Tf 13 TL 40 800 Td " + " ".join(
+            f"({_escape(line)}) '" for line in lines) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.pdf")
+        make_pdf(path, args.pages)
+
+        sequential, t_seq = timed(lambda: PyPDFLoader(path).load())
+        loader = ParallelPyPDFLoader(path, max_workers=args.workers,
+                                     pages_per_task=args.pages_per_task)
+        parallel, t_par = timed(loader.load)
+
+    same = [(d.page_content, d.metadata) for d in sequential] == \
+           [(d.page_content, d.metadata) for d in parallel]
+    print(f"pages: {args.pages}  workers: {args.workers}  identical output: {same}")
+    print(f"PyPDFLoader:         {t_seq:7.2f}s")
+    print(f"ParallelPyPDFLoader: {t_par:7.2f}s  ({t_seq / t_par:.1f}x)")
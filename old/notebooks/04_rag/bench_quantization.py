@@ -0,0 +1,84 @@
+"""
+Memory vs recall of the NumpyVectorStore quantization options.
+
+Builds the same synthetic (clustered) corpus with float32, int8 and pq codes,
+then reports resident index memory, recall@k against exact search and query
+time for a few re-rank factors.
+
+    python notebooks/04_rag/bench_quantization.py --n 20000 --dim 256 --k 10
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from numpy_store import NumpyVectorStore, normalize
+
+
+class MatrixEmbeddings(Embeddings):
+    """Texts are row numbers of a precomputed matrix."""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def embed_documents(self, texts):
+        return self.matrix[[int(t) for t in texts]]
+
+    def embed_query(self, text):
+        return self.matrix[int(text)]
+
+
+def make_corpus(n, dim, clusters=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    points = centers[rng.integers(clusters, size=n)] + 0.6 * rng.standard_normal((n, dim))
+    return normalize(points)
+
+
+def build(vectors, **kwargs):
+    store = NumpyVectorStore(tempfile.mkdtemp(), MatrixEmbeddings(vectors), **kwargs)
+    for start in range(0, len(vectors), 5000):
+        texts = [str(i) for i in range(start, min(start + 5000, len(vectors)))]
+        store.add_texts(texts, ids=texts)
+    return store
+
+
+def search(store, queries, k):
+    start = time.perf_counter()
+    hits = store.batch_similarity_search_with_score_by_vector(queries, k)
+    elapsed = time.perf_counter() - start
+    return [{doc.id for doc, _ in row} for row in hits], elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = make_corpus(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = normalize(vectors[rng.choice(args.n, args.queries)] + 0.3 * rng.standard_normal((args.queries, args.dim)))
+
+    exact_store = build(vectors)
+    truth, t_exact = search(exact_store, queries, args.k)
+    base = exact_store.index_bytes()
+    print(f"n={args.n} dim={args.dim} k={args.k} queries={args.queries}")
+    print(f"{'index':<22}{'memory':>10}{'ratio':>8}{'recall@k':>10}{'ms/query':>10}")
+    print(f"{'float32 (exact)':<22}{base / 1e6:>8.1f}MB{1:>7.1f}x{1:>10.3f}{t_exact * 1000 / args.queries:>10.2f}")
+
+    configs = [("int8", {}), ("pq", {"pq_subspaces": args.dim // 4}), ("pq", {"pq_subspaces": args.dim // 8})]
+    for name, extra in configs:
+        store = build(vectors, quantization=name, **extra)
+        for rerank in (1, 4, 16):
+            store.rerank_factor = rerank
+            found, elapsed = search(store, queries, args.k)
+            recall = np.mean([len(f & t) / args.k for f, t in zip(found, truth)])
+            label = f"{name}{'/' + str(extra['pq_subspaces']) if extra else ''} rerank x{rerank}"
+            memory = store.index_bytes()
+            print(f"{label:<22}{memory / 1e6:>8.1f}MB{base / memory:>7.1f}x{recall:>10.3f}"
+                  f"{elapsed * 1000 / args.queries:>10.2f}")
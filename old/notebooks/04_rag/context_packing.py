@@ -0,0 +1,105 @@
+"""
+Token budgeted packing of retrieved documents for `create_stuff_documents_chain`.
+
+The stuff chain pastes every retrieved chunk into `{context}`, so the prompt
+(and prefill time) grows with k and chunk size. `pack_documents` keeps the
+retriever's ranking but:
+
+- cuts the part a chunk shares with an already picked chunk of the same
+  source (the splitter's `chunk_overlap`), using `start_index`/`end_index`
+  metadata when present
+- drops near duplicates (word shingle jaccard >= `max_similarity`)
+- adds chunks best first while they fit in `max_tokens`
+
+    doc_chain = create_packed_stuff_documents_chain(llm, prompt, max_tokens=1200)
+"""
+from functools import lru_cache
+
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnablePassthrough
+
+
+@lru_cache(maxsize=None)
+def _encoding(name):
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(name)
+    except Exception:
+        # tiktoken missing or its encoding file can not be downloaded (offline)
+        return None
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text, encoding="cl100k_base"):
+    """Token count of `text`; ~4 characters per token when tiktoken is unavailable."""
+    enc = _encoding(encoding)
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def _shingles(text, size=5):
+    words = text.lower().split()
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def _trim_overlap(doc, picked):
+    """Removes the span `doc` shares with picked chunks of the same source."""
+    meta = doc.metadata
+    if "start_index" not in meta or "end_index" not in meta:
+        return doc
+    start, end = meta["start_index"], meta["end_index"]
+    text = doc.page_content
+    for other in picked:
+        om = other.metadata
+        if om.get("source") != meta.get("source") or om.get("page") != meta.get("page"):
+            continue
+        if "start_index" not in om:
+            continue
+        if om["start_index"] <= start < om["end_index"]:
+            # our head is already in the other chunk
+            cut = min(om["end_index"], end) - start
+            text, start = text[cut:], start + cut
+        elif om["start_index"] < end <= om["end_index"]:
+            # our tail is already in the other chunk
+            cut = end - max(om["start_index"], start)
+            text, end = text[:len(text) - cut], end - cut
+    if text == doc.page_content:
+        return doc
+    # the offsets follow the strip, they still point at exactly this text
+    stripped = text.strip()
+    lead = len(text) - len(text.lstrip())
+    start, end = start + lead, end - (len(text) - lead - len(stripped))
+    return Document(page_content=stripped,
+                    metadata={**meta, "start_index": start, "end_index": end})
+
+
+def pack_documents(docs, max_tokens=1500, max_similarity=0.8, encoding="cl100k_base"):
+    """Best first selection of `docs` (retriever order) within `max_tokens`."""
+    picked, shingles = [], []
+    used = 0
+    for doc in docs:
+        doc = _trim_overlap(doc, picked)
+        if not doc.page_content.strip():
+            continue
+        current = _shingles(doc.page_content)
+        if any(len(current & s) / len(current | s) >= max_similarity for s in shingles):
+            continue
+        tokens = count_tokens(doc.page_content, encoding)
+        if used + tokens > max_tokens:
+            # a smaller, lower ranked chunk may still fit
+            continue
+        picked.append(doc)
+        shingles.append(current)
+        used += tokens
+    return picked
+
+
+def create_packed_stuff_documents_chain(llm, prompt, max_tokens=1500, max_similarity=0.8, **kwargs):
+    """`create_stuff_documents_chain` that packs `context` into a token budget first."""
+    pack = RunnablePassthrough.assign(
+        context=lambda x: pack_documents(x["context"], max_tokens, max_similarity))
+    return (pack | create_stuff_documents_chain(llm, prompt, **kwargs)).with_config(
+        run_name="packed_stuff_documents_chain")
@@ -0,0 +1,150 @@
+"""
+Persistent embedding cache.
+
+`CachedEmbeddings` wraps any LangChain embeddings object (e.g. OllamaEmbeddings)
+and stores vectors in a sqlite file keyed by (model, sha256 of the text).
+Only cache misses are sent to the model, split in batches and spread over a
+small thread pool. Least recently used vectors are evicted once the cache
+grows over `max_bytes`.
+
+    embedding = CachedEmbeddings(OllamaEmbeddings(model="nomic-embed-text"),
+                                 "output/cache/embeddings.sqlite")
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+
+def _to_blob(vector):
+    return array("f", vector).tobytes()
+
+
+def _from_blob(blob):
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings, path, batch_size=32, max_workers=4,
+                 max_bytes=512 * 1024 * 1024, model=None):
+        self.embeddings = embeddings
+        self.model = model or getattr(embeddings, "model", type(embeddings).__name__)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def _key(self, kind, text):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}:{kind}:{digest}"
+
+    def _lookup(self, keys):
+        found = {}
+        with self._lock:
+            # sqlite limits the number of bound parameters, query in slices
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part)
+                found.update((k, _from_blob(v)) for k, v in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found])
+                self._conn.commit()
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            blob = _to_blob(vector)
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # drop the least recently used rows until we are 10% under the limit
+        target = total - int(self.max_bytes * 0.9)
+        stale, freed = [], 0
+        for key, size in self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used"):
+            stale.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+        self._conn.commit()
+
+    def _embed_missing(self, texts):
+        batches = [texts[i:i + self.batch_size]
+                   for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.max_workers <= 1:
+            return [v for batch in batches for v in self.embeddings.embed_documents(batch)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = pool.map(self.embeddings.embed_documents, batches)
+            return [v for batch in results for v in batch]
+
+    def _embed(self, kind, texts):
+        keys = [self._key(kind, t) for t in texts]
+        cached = self._lookup(list(set(keys)))
+
+        # embed every distinct missing text only once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            if kind == "query":
+                vectors = [self.embeddings.embed_query(t) for t in missing.values()]
+            else:
+                vectors = self._embed_missing(list(missing.values()))
+            new = list(zip(missing.keys(), vectors))
+            self._store(new)
+            cached.update(new)
+        return [cached[k] for k in keys]
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._embed("doc", list(texts))
+
+    def embed_query(self, text):
+        return self._embed("query", [text])[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
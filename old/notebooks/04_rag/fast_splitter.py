@@ -0,0 +1,119 @@
+"""
+Offset based drop-in for `RecursiveCharacterTextSplitter`.
+
+The recursive splitter builds lists of substrings with `re.split`, glues the
+separators back on and re-joins pieces for every chunk. With the default
+settings (separators kept at the start of each piece, no regex, `len` as
+length) every piece is a contiguous slice of the original text, so the same
+algorithm can run on (start, end) offsets only and create a string once per
+final chunk.
+
+Chunk boundaries are identical to
+`RecursiveCharacterTextSplitter(chunk_size=..., chunk_overlap=...)`, and every
+document gets `start_index`/`end_index` metadata pointing into its source text.
+"""
+from collections import deque
+
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+class FastRecursiveSplitter(TextSplitter):
+    def __init__(self, chunk_size=4000, chunk_overlap=200, separators=None):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._separators = separators or DEFAULT_SEPARATORS
+
+    def split_offsets(self, text):
+        """Returns the (start, end) offsets of every chunk of `text`."""
+        out = []
+        self._split(text, 0, len(text), self._separators, out)
+        return out
+
+    def lazy_split_text(self, text):
+        for start, end in self.split_offsets(text):
+            yield text[start:end]
+
+    def split_text(self, text):
+        return list(self.lazy_split_text(text))
+
+    def lazy_create_documents(self, texts, metadatas=None):
+        metadatas = metadatas or [{}] * len(texts)
+        for text, metadata in zip(texts, metadatas):
+            for start, end in self.split_offsets(text):
+                yield Document(page_content=text[start:end],
+                               metadata={**metadata, "start_index": start, "end_index": end})
+
+    def create_documents(self, texts, metadatas=None):
+        return list(self.lazy_create_documents(texts, metadatas))
+
+    def _pieces(self, text, start, end, separator):
+        # same pieces as re.split with the separator kept at the start of each one
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+        pieces = []
+        prev = start
+        pos = text.find(separator, start, end)
+        while pos != -1:
+            if pos > prev:
+                pieces.append((prev, pos))
+            prev = pos
+            pos = text.find(separator, pos + len(separator), end)
+        if end > prev:
+            pieces.append((prev, end))
+        return pieces
+
+    def _split(self, text, start, end, separators, out):
+        separator = separators[-1]
+        rest = []
+        for i, sep in enumerate(separators):
+            if sep == "":
+                separator = sep
+                break
+            if text.find(sep, start, end) != -1:
+                separator = sep
+                rest = separators[i + 1:]
+                break
+
+        good = []
+        for piece in self._pieces(text, start, end, separator):
+            if piece[1] - piece[0] < self._chunk_size:
+                good.append(piece)
+                continue
+            if good:
+                self._merge(text, good, out)
+                good = []
+            if rest:
+                self._split(text, piece[0], piece[1], rest, out)
+            else:
+                # nothing left to split on, kept as is (like the original)
+                out.append(piece)
+        if good:
+            self._merge(text, good, out)
+
+    def _merge(self, text, pieces, out):
+        size, overlap = self._chunk_size, self._chunk_overlap
+        current = deque()
+        total = 0
+        for start, end in pieces:
+            length = end - start
+            if total + length > size and current:
+                self._emit(text, current[0][0], current[-1][1], out)
+                while total > overlap or (total + length > size and total > 0):
+                    first_start, first_end = current.popleft()
+                    total -= first_end - first_start
+            current.append((start, end))
+            total += length
+        if current:
+            self._emit(text, current[0][0], current[-1][1], out)
+
+    @staticmethod
+    def _emit(text, start, end, out):
+        # offsets of `text[start:end].strip()`, without building the string
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            out.append((start, end))
@@ -0,0 +1,75 @@
+"""
+History aware retriever that keeps the question rewrite off the critical path.
+
+`create_history_aware_retriever` always waits for the LLM to rewrite the
+question before it retrieves anything. This version:
+
+- skips the rewrite when there is no chat history or the question has no
+  referring words ("it", "they", "that one", ...) and retrieves right away
+- otherwise starts retrieval on the raw question while the LLM rewrites it;
+  when the rewrite comes back unchanged those results are used as they are,
+  if not the rewritten question is retrieved too and both result lists are
+  merged with reciprocal rank fusion
+
+Same inputs/outputs as `create_history_aware_retriever`, so it plugs into
+`create_retrieval_chain` unchanged.
+"""
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+from hybrid_retriever import reciprocal_rank_fusion
+
+REFERRING = re.compile(
+    r"\b(it|its|they|them|their|theirs|this|that|these|those|he|him|his|she|her|hers|"
+    r"there|former|latter|above|previous|same|another|other|else|more|one|ones)\b",
+    re.IGNORECASE,
+)
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="history-retriever")
+
+
+def needs_rewrite(inputs):
+    return bool(inputs.get("chat_history")) and bool(REFERRING.search(inputs["input"]))
+
+
+def _same_question(a, b):
+    return " ".join(a.lower().split()).strip(" ?") == " ".join(b.lower().split()).strip(" ?")
+
+
+def create_concurrent_history_aware_retriever(llm, retriever, prompt):
+    if "input" not in prompt.input_variables:
+        raise ValueError(f"Expected `input` to be a prompt variable, but got {prompt.input_variables}")
+    rewrite = prompt | llm | StrOutputParser()
+
+    def _merge(raw_docs, rewritten_docs):
+        if rewritten_docs is None:
+            return raw_docs
+        return reciprocal_rank_fusion([rewritten_docs, raw_docs], k=max(len(rewritten_docs), len(raw_docs)))
+
+    def retrieve(inputs, config=None):
+        question = inputs["input"]
+        if not needs_rewrite(inputs):
+            return retriever.invoke(question, config)
+        raw = _pool.submit(retriever.invoke, question, config)
+        rewritten = rewrite.invoke(inputs, config)
+        rewritten_docs = None
+        if not _same_question(question, rewritten):
+            rewritten_docs = retriever.invoke(rewritten, config)
+        return _merge(raw.result(), rewritten_docs)
+
+    async def aretrieve(inputs, config=None):
+        question = inputs["input"]
+        if not needs_rewrite(inputs):
+            return await retriever.ainvoke(question, config)
+        raw, rewritten = await asyncio.gather(retriever.ainvoke(question, config),
+                                              rewrite.ainvoke(inputs, config))
+        rewritten_docs = None
+        if not _same_question(question, rewritten):
+            rewritten_docs = await retriever.ainvoke(rewritten, config)
+        return _merge(raw, rewritten_docs)
+
+    return RunnableLambda(retrieve, afunc=aretrieve, name="concurrent_chat_retriever_chain")
@@ -0,0 +1,290 @@
+"""
+Hybrid keyword + vector retrieval.
+
+`BM25Index` is an inverted index in a sqlite file (term -> chunk, term
+frequency). It has the same `add_documents` / `delete` / `get` methods as a
+vector store, so it is filled incrementally with the same tools:
+
+    bm25 = BM25Index('output/db/bm25/index.sqlite')
+    sync_documents(bm25, txt_docs, splitter, 'output/db/bm25/')
+
+Lookups stay well under a millisecond on large corpora: stopwords are not
+indexed, each posting stores its BM25 term weight ("impact", length
+normalised at indexing time) and postings are read best impact first, only
+until no unread chunk can beat the k-th score (Fagin's threshold algorithm).
+A query for a rare term reads a handful of rows, a common term only its top k.
+Impacts only order the reads: the chunks found are scored from their term
+frequency and length with the current average length, so results are exact
+BM25 also while the stored impacts lag behind (up to `IMPACT_DRIFT`).
+
+`HybridRetriever` runs BM25 and vector search at the same time and merges the
+two rankings with reciprocal rank fusion (score = sum of 1 / (rrf_k + rank)),
+so exact names and titles are found even when embeddings miss them.
+"""
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+TOKEN = re.compile(r"\w+")
+
+# too common to rank anything, kept out of the index and out of queries
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she should so some such than that the
+their theirs them themselves then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+# impacts are recomputed when the average chunk length moved more than this since they were written
+IMPACT_DRIFT = 0.1
+
+# ids per `IN (...)` query, below sqlite's host parameter limit
+CHUNK = 500
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def _chunks(items, size=CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _marks(items):
+    return ",".join("?" * len(items))
+
+
+class BM25Index:
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA cache_size=-65536;
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY, length INTEGER NOT NULL,
+                text TEXT NOT NULL, metadata TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL, impact REAL NOT NULL,
+                PRIMARY KEY (term, id)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS postings_impact ON postings(term, impact DESC);
+        """)
+        # no index on postings(id): deletes find a chunk's postings by tokenizing its stored text
+        self._load_stats()
+
+    def _load_stats(self):
+        self._count, self._total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'impact_avg_length'").fetchone()
+        self._impact_avg = row[0] if row else None
+
+    def __len__(self):
+        return self._count
+
+    def _refresh_impacts(self):
+        """Recomputes every impact with the current average length (caller holds the transaction)."""
+        avg_length = self._total / self._count if self._count else None
+        if avg_length:
+            self._conn.execute(
+                "UPDATE postings SET impact = tf * :k1p1 / (tf + :k1 * (1 - :b + :b * "
+                "(SELECT length FROM docs WHERE docs.id = postings.id) / :avg))",
+                {"k1p1": self.k1 + 1, "k1": self.k1, "b": self.b, "avg": avg_length})
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('impact_avg_length', ?)", (avg_length,))
+        self._impact_avg = avg_length
+
+    def add_documents(self, documents, ids=None, **kwargs):
+        if not documents:
+            return []
+        ids = ids or [doc.id or str(uuid.uuid4()) for doc in documents]
+        counted = [Counter(tokenize(doc.page_content)) for doc in documents]
+        lengths = [sum(terms.values()) for terms in counted]
+        with self._lock, self._conn:
+            self._delete(ids)
+            if self._impact_avg is None:
+                total = self._total + sum(lengths)
+                self._impact_avg = total / (self._count + len(documents)) if total else 1.0
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('impact_avg_length', ?)",
+                                   (self._impact_avg,))
+            df = Counter()
+            postings = []
+            for doc_id, terms, length in zip(ids, counted, lengths):
+                norm = self.k1 * (1 - self.b + self.b * length / self._impact_avg)
+                kept = [term for term in terms if term not in STOPWORDS]
+                df.update(kept)
+                # bm25 term weight without the idf, which changes with every added chunk
+                postings.extend((term, doc_id, terms[term], terms[term] * (self.k1 + 1) / (terms[term] + norm))
+                                for term in kept)
+            self._conn.executemany(
+                "INSERT INTO docs VALUES (?, ?, ?, ?)",
+                [(doc_id, length, doc.page_content, json.dumps(doc.metadata))
+                 for doc_id, doc, length in zip(ids, documents, lengths)])
+            postings.sort()  # b-tree order, pages are filled instead of split at random
+            self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+            self._conn.executemany(
+                "INSERT INTO terms VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                df.items())
+            self._count += len(documents)
+            self._total += sum(lengths)
+            if abs(self._total / self._count - self._impact_avg) > IMPACT_DRIFT * self._impact_avg:
+                self._refresh_impacts()
+        return ids
+
+    def _delete(self, ids):
+        for chunk in _chunks(ids):
+            rows = self._conn.execute(
+                f"SELECT id, length, text FROM docs WHERE id IN ({_marks(chunk)})", chunk).fetchall()
+            if not rows:
+                continue
+            df = Counter()
+            postings = []
+            for doc_id, _, text in rows:
+                for term in set(tokenize(text)) - STOPWORDS:
+                    postings.append((term, doc_id))
+                    df[term] += 1
+            postings.sort()
+            self._conn.executemany("DELETE FROM postings WHERE term = ? AND id = ?", postings)
+            self._conn.executemany("UPDATE terms SET df = df - ? WHERE term = ?", [(n, t) for t, n in df.items()])
+            self._conn.execute("DELETE FROM terms WHERE df <= 0")
+            found = [r[0] for r in rows]
+            self._conn.execute(f"DELETE FROM docs WHERE id IN ({_marks(found)})", found)
+            self._count -= len(rows)
+            self._total -= sum(r[1] for r in rows)
+
+    def delete(self, ids=None, **kwargs):
+        with self._lock, self._conn:
+            if ids is None:
+                self._conn.execute("DELETE FROM postings")
+                self._conn.execute("DELETE FROM terms")
+                self._conn.execute("DELETE FROM docs")
+                self._conn.execute("DELETE FROM meta")
+            else:
+                self._delete(ids)
+            self._load_stats()
+        return True
+
+    def get(self, ids=None, include=None):
+        """Chroma style listing of the stored ids (used by `incremental_index`)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM docs").fetchall()
+        found = [r[0] for r in rows]
+        if ids is None:
+            return {"ids": found}
+        wanted = set(ids)
+        return {"ids": [i for i in found if i in wanted]}
+
+    def search(self, query, k=4):
+        """Top k (document, bm25 score) pairs for `query`."""
+        terms = sorted({t for t in tokenize(query) if t not in STOPWORDS})
+        if not terms or not self._count:
+            return []
+        with self._lock:
+            dfs = self._conn.execute(
+                f"SELECT term, df FROM terms WHERE term IN ({_marks(terms)})", terms).fetchall()
+            idf = {t: math.log(1 + (self._count - df + 0.5) / (df + 0.5)) for t, df in dfs}
+            if not idf:
+                return []
+            terms = list(idf)
+            avg_length = self._total / self._count
+            # a stored impact is at most avg_length / impact_avg below the live weight
+            # (only the length part of its denominator scales with the average)
+            slack = max(1.0, avg_length / self._impact_avg)
+            # sorted access: each term's postings, best impact first
+            cursors = {t: self._conn.execute(
+                "SELECT id, impact FROM postings WHERE term = ? ORDER BY impact DESC", (t,)) for t in terms}
+            frontier = {}  # term -> impact of the last posting read
+            scores = {}
+            batch = max(k, 8)
+            while cursors:
+                seen = set()
+                for term, cursor in list(cursors.items()):
+                    rows = cursor.fetchmany(batch)
+                    if len(rows) < batch:
+                        del cursors[term]
+                        frontier.pop(term, None)
+                    else:
+                        frontier[term] = rows[-1][1]
+                    seen.update(doc_id for doc_id, _ in rows if doc_id not in scores)
+                # random access: full score of every newly seen chunk, with the live average length
+                for chunk in _chunks(seen):
+                    rows = self._conn.execute(
+                        f"SELECT p.id, p.term, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.id "
+                        f"WHERE p.term IN ({_marks(terms)}) AND p.id IN ({_marks(chunk)})", terms + chunk)
+                    for doc_id, term, tf, length in rows:
+                        norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + idf[term] * tf * (self.k1 + 1) / (tf + norm)
+                # nothing unread can score more than the sum of the frontier impacts, scaled by `slack`
+                threshold = slack * sum(idf[t] * impact for t, impact in frontier.items())
+                if len(scores) >= k and sorted(scores.values(), reverse=True)[k - 1] >= threshold:
+                    break
+                batch *= 2
+            for cursor in cursors.values():
+                cursor.close()
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            ids = [doc_id for doc_id, _ in top]
+            rows = {r[0]: r[1:] for r in self._conn.execute(
+                f"SELECT id, text, metadata FROM docs WHERE id IN ({_marks(ids)})", ids)}
+        return [(Document(id=doc_id, page_content=rows[doc_id][0], metadata=json.loads(rows[doc_id][1])), score)
+                for doc_id, score in top]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _key(doc):
+    # chroma does not return ids, so match results on source + text
+    return doc.metadata.get("source", ""), doc.page_content
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=60):
+    """Merges ranked document lists, best fused score first."""
+    scores = Counter()
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _key(doc)
+            scores[key] += 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key, _ in scores.most_common(k)]
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + vector search merged with reciprocal rank fusion.
+
+    Drop-in for `db.as_retriever()`: `HybridRetriever(vectorstore=db, keyword_index=bm25, k=4)`
+    """
+
+    vectorstore: object
+    keyword_index: object
+    k: int = 4
+    fetch_k: int = 20  # results taken from each side before fusion
+    rrf_k: int = 60
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            keyword = pool.submit(self.keyword_index.search, query, self.fetch_k)
+            dense = pool.submit(self.vectorstore.similarity_search, query, k=self.fetch_k)
+            rankings = [[doc for doc, _ in keyword.result()], dense.result()]
+        return reciprocal_rank_fusion(rankings, self.k, self.rrf_k)
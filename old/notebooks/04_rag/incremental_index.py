@@ -0,0 +1,159 @@
+"""
+Incremental re-indexing for a persisted vector store (Chroma).
+
+A manifest of content hashes is kept next to the store:
+
+    {"sources": {"data/super_hero.txt": {"hash": "...", "splitter": {"type": "...", "chunk_size": 1000, ...},
+                                         "ids": ["...", ...]}}}
+
+On every run only the chunks of new or changed sources are embedded and
+upserted, chunks that disappeared are deleted, and unchanged sources are not
+even re-split. A source split with other splitter settings (e.g. a new
+`chunk_size` or `chunk_overlap`) counts as changed and is re-split.
+"""
+import hashlib
+import json
+import os
+from collections import defaultdict
+
+MANIFEST_NAME = "manifest.json"
+
+
+def hash_text(text):
+    """Returns the sha256 hex digest of a piece of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_ids(source, chunks):
+    """Stable, content-derived ids for the chunks of one source.
+
+    Identical chunks inside the same source get an occurrence counter so the
+    ids stay unique.
+    """
+    seen = defaultdict(int)
+    ids = []
+    for chunk in chunks:
+        digest = hash_text(source + "\0" + chunk.page_content)
+        ids.append(f"{digest[:32]}-{seen[digest]}")
+        seen[digest] += 1
+    return ids
+
+
+def splitter_config(splitter):
+    """The settings of a text splitter, as stored in the manifest.
+
+    Callables (e.g. `length_function`) and other objects are recorded by
+    their type name, so the config stays the same from one run to the next.
+    """
+    def name(value):
+        return getattr(value, "__qualname__", type(value).__qualname__)
+
+    config = {"type": name(type(splitter))}
+    for key, value in sorted(vars(splitter).items()):
+        config[key.lstrip("_")] = name(value) if callable(value) else value
+    return json.loads(json.dumps(config, default=name))
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    # write to a temp file first so a crash never leaves a half written manifest
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def manifest_version(persist_directory):
+    """Changes whenever `sync_documents` changed the store, e.g. to invalidate caches."""
+    try:
+        return os.stat(os.path.join(persist_directory, MANIFEST_NAME)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def group_by_source(documents):
+    """Groups loaded documents (e.g. pdf pages) by their `source` metadata."""
+    groups = defaultdict(list)
+    for doc in documents:
+        groups[doc.metadata.get("source", "")].append(doc)
+    return groups
+
+
+def sync_documents(db, documents, splitter, persist_directory, remove_missing=True, keep_sources=()):
+    """Brings `db` in sync with `documents`, touching only what changed.
+
+    documents: loaded (not yet split) documents, e.g. `TextLoader(...).load()`
+    splitter: text splitter used for the changed sources
+    remove_missing: delete chunks of sources that are no longer passed in
+    keep_sources: sources not passed in but unchanged (e.g. `AsyncWebLoader.skipped`,
+                  pages answering 304), their chunks are kept
+
+    Returns a dict with the number of added/deleted chunks and skipped sources.
+    `outdated_sources` counts kept sources split with other splitter settings:
+    without their documents they can't be re-split now, they are the next
+    time they are passed in (e.g. after deleting the loader's validators).
+    """
+    manifest_path = os.path.join(persist_directory, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    changed = manifest is None
+    if manifest is None:
+        # store was built without a manifest: its ids are unknown, start clean
+        existing = db.get(include=[])["ids"]
+        if existing:
+            db.delete(ids=existing)
+        manifest = {"sources": {}}
+
+    sources = manifest["sources"]
+    config = splitter_config(splitter)
+    stats = {"added": 0, "deleted": 0, "unchanged_sources": 0, "outdated_sources": 0}
+
+    for source, docs in group_by_source(documents).items():
+        source_hash = hash_text("\0".join(doc.page_content for doc in docs))
+        entry = sources.get(source)
+        if entry and entry["hash"] == source_hash and entry.get("splitter") == config:
+            stats["unchanged_sources"] += 1
+            continue
+
+        chunks = splitter.split_documents(docs)
+        ids = chunk_ids(source, chunks)
+        old_ids = set(entry["ids"]) if entry else set()
+        new_ids = set(ids)
+
+        stale = list(old_ids - new_ids)
+        if stale:
+            db.delete(ids=stale)
+        fresh = [(i, c) for i, c in zip(ids, chunks) if i not in old_ids]
+        if fresh:
+            db.add_documents([c for _, c in fresh], ids=[i for i, _ in fresh])
+
+        sources[source] = {"hash": source_hash, "splitter": config, "ids": ids}
+        changed = True
+        stats["added"] += len(fresh)
+        stats["deleted"] += len(stale)
+
+    for source in keep_sources:
+        if source in sources:
+            stats["unchanged_sources"] += 1
+            if sources[source].get("splitter") != config:
+                stats["outdated_sources"] += 1
+
+    if remove_missing:
+        seen = {doc.metadata.get("source", "") for doc in documents} | set(keep_sources)
+        for source in [s for s in sources if s not in seen]:
+            ids = sources.pop(source)["ids"]
+            if ids:
+                db.delete(ids=ids)
+            stats["deleted"] += len(ids)
+            changed = True
+
+    # only rewrite when something changed, so the manifest mtime marks real updates
+    if changed:
+        save_manifest(manifest_path, manifest)
+    return stats
@@ -0,0 +1,454 @@
+"""
+In-process vector store on a memory-mapped NumPy matrix.
+
+Files in `persist_directory`:
+
+    meta.json        {"dim": 768}
+    vectors.f32      normalized float32 rows, appended, read through np.memmap
+    ids.txt          one id per row
+    docs.jsonl       one {"text", "metadata"} record per row
+    offsets.u64      byte offset of every record in docs.jsonl
+    tombstones.i64   rows removed by delete() / re-added ids
+    codes_*.bin      compressed codes, only with `quantization` (see quantization.py)
+    quantizer.npz    trained quantizer state (pq codebook)
+    compact.json     only while compact() swaps in its `*.new` files
+
+Opening a store only maps the files and reads the ids, so cold start is cheap
+and memory use is the page cache of what is actually searched. Search is a
+matrix product over blocks of rows with `argpartition` for the top k, and a
+whole batch of queries is scored at once. Written for a single writer.
+
+ids.txt is the row count: an append that crashed before (or while) writing
+it leaves rows in the other files that are cut off again when the store is
+opened, and codes missing after it are re-encoded from the vectors.
+
+With `quantization="int8"` or `"pq"` only the compact codes are kept in RAM:
+they pick `k * rerank_factor` candidates, which are then re-ranked with their
+exact float rows read from the memory map. pq needs 256 rows to learn its
+codebook; until then search is exact.
+
+    db = NumpyVectorStore('output/db/numpy/', embedding)
+    db.add_documents(docs)
+    retriever = db.as_retriever(search_type="similarity", search_kwargs={"k": 3})
+"""
+import json
+import os
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from quantization import PQQuantizer, code_bytes, make_quantizer
+
+COMPACT_PLAN = "compact.json"
+
+
+def normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores, k):
+    """Indices of the k best scores of every row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+class NumpyVectorStore(VectorStore):
+    def __init__(self, persist_directory, embedding_function, block_rows=16384,
+                 quantization=None, rerank_factor=8, pq_subspaces=None):
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self.block_rows = block_rows
+        self.rerank_factor = rerank_factor
+        os.makedirs(persist_directory, exist_ok=True)
+        self._finish_compact()
+
+        meta = self._load_json("meta.json") or {}
+        stored = meta.get("quantization")
+        if meta and quantization and quantization != stored:
+            raise ValueError(f"Store was created with quantization={stored!r}")
+        self.dim = meta.get("dim")
+        self.quantization = stored if meta else quantization
+        self.pq_subspaces = meta.get("pq_subspaces", pq_subspaces)
+        self._ids = self._read_ids()
+        self._truncate_rows()
+        self._deleted = np.zeros(len(self._ids), dtype=bool)
+        tombstones = self._read_array("tombstones.i64", np.int64)
+        self._deleted[tombstones[tombstones < len(self._ids)]] = True
+        self._rows = {i: row for row, i in enumerate(self._ids) if not self._deleted[row]}
+        self._vectors = None
+        self._offsets = None
+        self._quantizer = None
+        self._codes = None
+        if self.dim is not None:
+            self._open_quantizer()
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    # ---- storage -------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.persist_directory, name)
+
+    def _load_json(self, name):
+        if not os.path.exists(self._path(name)):
+            return None
+        with open(self._path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _read_lines(self, name):
+        if not os.path.exists(self._path(name)):
+            return []
+        with open(self._path(name), "r", encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def _read_ids(self):
+        path = self._path("ids.txt")
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):  # crashed in the middle of a line
+            os.truncate(path, complete)
+        return data[:complete].decode("utf-8").splitlines()
+
+    def _truncate(self, name, size):
+        path = self._path(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    def _truncate_rows(self):
+        """Cuts docs, offsets, vectors and tombstones back to the rows listed in ids.txt."""
+        n = len(self._ids)
+        self._truncate("vectors.f32", n * (self.dim or 0) * 4)
+        self._truncate("offsets.u64", n * 8)
+        tombstones = self._path("tombstones.i64")
+        if os.path.exists(tombstones):
+            self._truncate("tombstones.i64", os.path.getsize(tombstones) // 8 * 8)
+        end = 0
+        if n:
+            # the record of the last row ends the file
+            offsets = self._mapped("offsets.u64", np.uint64, (n,))
+            with open(self._path("docs.jsonl"), "rb") as f:
+                f.seek(int(offsets[n - 1]))
+                f.readline()
+                end = f.tell()
+            del offsets
+        self._truncate("docs.jsonl", end)
+
+    def _read_array(self, name, dtype):
+        if not os.path.exists(self._path(name)):
+            return np.empty(0, dtype=dtype)
+        return np.fromfile(self._path(name), dtype=dtype)
+
+    def _mapped(self, name, dtype, shape):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=shape)
+
+    def _matrix(self):
+        if self._vectors is None:
+            self._vectors = self._mapped("vectors.f32", np.float32, (len(self._ids), self.dim or 0))
+        return self._vectors
+
+    def _open_quantizer(self):
+        if not self.quantization:
+            return
+        kwargs = {"subspaces": self.pq_subspaces} if self.quantization == "pq" else {}
+        self._quantizer = make_quantizer(self.quantization, self.dim, **kwargs)
+        if os.path.exists(self._path("quantizer.npz")):
+            with np.load(self._path("quantizer.npz")) as state:
+                self._quantizer.load_state(dict(state))
+        self._codes = {}
+        n = len(self._ids)
+        for key, (dtype, width) in self._quantizer.layout().items():
+            name, row_bytes = f"codes_{key}.bin", np.dtype(dtype).itemsize * width
+            size = os.path.getsize(self._path(name)) if os.path.exists(self._path(name)) else 0
+            # rows past ids.txt or half a row, left by a crashed append
+            self._truncate(name, min(n, size // row_bytes) * row_bytes)
+            self._codes[key] = self._read_array(name, dtype).reshape(-1, width)
+        if self._quantizer.trained:
+            have = min(len(codes) for codes in self._codes.values())
+            if have < n:  # crashed after ids.txt, before the codes
+                for key, codes in self._codes.items():
+                    self._truncate(f"codes_{key}.bin", have * codes.itemsize * codes.shape[1])
+                    self._codes[key] = codes[:have]
+                self._append_codes(self._quantizer.encode(np.asarray(self._matrix()[have:])))
+        elif n >= PQQuantizer.centroids:
+            self._train_quantizer()
+
+    def _append_codes(self, codes):
+        for key, array in codes.items():
+            with open(self._path(f"codes_{key}.bin"), "ab") as f:
+                f.write(np.ascontiguousarray(array).tobytes())
+            self._codes[key] = np.concatenate([self._codes[key], array])
+
+    def _train_quantizer(self):
+        # learn the pq codebook from the stored rows and encode all of them
+        vectors = np.asarray(self._matrix())
+        self._quantizer.train(vectors)
+        np.savez(self._path("quantizer.npz"), **self._quantizer.state())
+        for key, (dtype, width) in self._quantizer.layout().items():
+            self._codes[key] = np.empty((0, width), dtype=dtype)
+            if os.path.exists(self._path(f"codes_{key}.bin")):
+                os.remove(self._path(f"codes_{key}.bin"))
+        self._append_codes(self._quantizer.encode(vectors))
+
+    def _append_rows(self, ids, vectors, texts, metadatas):
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self._path("meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "quantization": self.quantization,
+                           "pq_subspaces": self.pq_subspaces}, f)
+            self._open_quantizer()
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim} dimensional embeddings, got {vectors.shape[1]}")
+
+        start = os.path.getsize(self._path("docs.jsonl")) if os.path.exists(self._path("docs.jsonl")) else 0
+        records, offsets = [], []
+        for text, metadata in zip(texts, metadatas):
+            line = (json.dumps({"text": text, "metadata": metadata}) + "\n").encode("utf-8")
+            offsets.append(start)
+            start += len(line)
+            records.append(line)
+
+        # ids.txt last: it is the row count, rows written before a crash are cut off on open (_truncate_rows)
+        with open(self._path("docs.jsonl"), "ab") as f:
+            f.write(b"".join(records))
+        with open(self._path("offsets.u64"), "ab") as f:
+            f.write(np.asarray(offsets, dtype=np.uint64).tobytes())
+        with open(self._path("vectors.f32"), "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self._path("ids.txt"), "a", encoding="utf-8") as f:
+            f.write("".join(i + "\n" for i in ids))
+
+        first = len(self._ids)
+        self._ids.extend(ids)
+        self._deleted = np.concatenate([self._deleted, np.zeros(len(ids), dtype=bool)])
+        self._rows.update((i, first + n) for n, i in enumerate(ids))
+        self._vectors = self._offsets = None
+
+        if self._quantizer is not None:
+            if self._quantizer.trained:
+                self._append_codes(self._quantizer.encode(vectors))
+            elif len(self._ids) >= PQQuantizer.centroids:
+                self._train_quantizer()
+
+    def _tombstone(self, rows):
+        if not rows:
+            return
+        with open(self._path("tombstones.i64"), "ab") as f:
+            f.write(np.asarray(rows, dtype=np.int64).tobytes())
+        self._deleted[rows] = True
+
+    def _documents(self, rows):
+        if self._offsets is None:
+            self._offsets = self._mapped("offsets.u64", np.uint64, (len(self._ids),))
+        docs = []
+        with open(self._path("docs.jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(int(self._offsets[row]))
+                record = json.loads(f.readline())
+                docs.append(Document(id=self._ids[row], page_content=record["text"],
+                                     metadata=record["metadata"]))
+        return docs
+
+    # ---- VectorStore api -----------------------------------------------
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        if len(metadatas) != len(texts) or len(ids) != len(texts):
+            raise ValueError("texts, metadatas and ids must have the same length")
+        last = {i: n for n, i in enumerate(ids)}
+        if len(last) < len(ids):
+            # an id given twice in one batch: the later text wins, as with a second add
+            keep = sorted(last.values())
+            texts, metadatas, ids = ([values[n] for n in keep] for values in (texts, metadatas, ids))
+
+        vectors = normalize(self.embedding_function.embed_documents(texts))
+        # re-adding an id replaces it
+        self._tombstone([self._rows[i] for i in ids if i in self._rows])
+        self._append_rows(ids, vectors, texts, metadatas)
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        if ids is None:
+            ids = list(self._rows)
+        self._tombstone([self._rows.pop(i) for i in ids if i in self._rows])
+        return True
+
+    def get(self, ids=None, include=None):
+        """Chroma style listing of the stored ids (used by `incremental_index`)."""
+        live = list(self._rows) if ids is None else [i for i in ids if i in self._rows]
+        return {"ids": live}
+
+    def get_by_ids(self, ids):
+        return self._documents([self._rows[i] for i in ids if i in self._rows])
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _scan(self, queries, k, score_block):
+        """Running top k over all rows, scoring `block_rows` rows at a time."""
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self._ids), self.block_rows):
+            end = min(start + self.block_rows, len(self._ids))
+            scores = score_block(start, end)
+            scores[:, self._deleted[start:end]] = -np.inf
+            picked = top_k(scores, k)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, picked, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, picked + start], axis=1)
+            # keep only the running best k between blocks
+            keep = top_k(best_scores, k)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return best_scores, best_rows
+
+    def _rerank(self, queries, candidates, k):
+        """Exact scores for the candidate rows of every query, read from the memory map."""
+        matrix = self._matrix()
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), k), dtype=np.int64)
+        for n, (query, rows) in enumerate(zip(queries, candidates)):
+            rows = np.sort(rows[rows >= 0])
+            scores = np.asarray(matrix[rows]) @ query
+            picked = top_k(scores[None], k)[0]
+            best_scores[n, :len(picked)] = scores[picked]
+            best_rows[n, :len(picked)] = rows[picked]
+        return best_scores, best_rows
+
+    def batch_similarity_search_with_score_by_vector(self, embeddings, k=4):
+        """Top k (document, cosine similarity) pairs for every query vector."""
+        queries = normalize(np.atleast_2d(embeddings))
+        if self._quantizer is not None and self._quantizer.trained:
+            def approximate(start, end):
+                block = {key: array[start:end] for key, array in self._codes.items()}
+                return self._quantizer.scores(queries, block)
+
+            scores, rows = self._scan(queries, k * self.rerank_factor, approximate)
+            rows[~np.isfinite(scores)] = -1
+            best_scores, best_rows = self._rerank(queries, rows, k)
+        else:
+            matrix = self._matrix()
+            best_scores, best_rows = self._scan(
+                queries, k, lambda start, end: queries @ np.asarray(matrix[start:end]).T)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            live = np.isfinite(scores)
+            docs = self._documents(rows[live])
+            results.append(list(zip(docs, scores[live].tolist())))
+        return results
+
+    def index_bytes(self):
+        """RAM needed to scan the index: the codes, or the whole float matrix."""
+        if self._quantizer is not None and self._quantizer.trained:
+            return code_bytes(self._codes)
+        return len(self._ids) * (self.dim or 0) * 4
+
+    def batch_similarity_search(self, queries, k=4):
+        """Embeds and searches many queries with a single matrix product."""
+        vectors = [self.embedding_function.embed_query(q) for q in queries]
+        return [[doc for doc, _ in hits]
+                for hits in self.batch_similarity_search_with_score_by_vector(vectors, k)]
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4):
+        return self.batch_similarity_search_with_score_by_vector([embedding], k)[0]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embedding_function.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # cosine similarity in [-1, 1] -> relevance in [0, 1]
+        return lambda score: min(1.0, max(0.0, (score + 1.0) / 2.0))
+
+    def _write_new(self, name, data):
+        # `name.new`, on disk (fsync) before compact.json says it is complete
+        with open(self._path(name + ".new"), "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _finish_compact(self):
+        """Completes a compact() that was interrupted, or drops its partial files."""
+        plan = self._load_json(COMPACT_PLAN)
+        if plan is not None:
+            # every new file is written: roll forward
+            for name in plan["replace"]:
+                if os.path.exists(self._path(name + ".new")):
+                    os.replace(self._path(name + ".new"), self._path(name))
+            for name in plan["remove"]:
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            os.remove(self._path(COMPACT_PLAN))
+        for name in os.listdir(self.persist_directory):
+            if name.endswith(".new") or name == COMPACT_PLAN + ".tmp":  # crashed before the plan was written: the old files are intact
+                os.remove(self._path(name))
+
+    def compact(self):
+        """Rewrites the files without deleted rows; a crash leaves either the old or the new store."""
+        if self.dim is None:
+            return
+        live = [row for row in range(len(self._ids)) if not self._deleted[row]]
+        ids = [self._ids[row] for row in live]
+        vectors = np.asarray(self._matrix()[live]) if live else np.empty((0, self.dim), np.float32)
+        docs = self._documents(live)
+        records = [(json.dumps({"text": d.page_content, "metadata": d.metadata}) + "\n").encode("utf-8")
+                   for d in docs]
+        offsets = np.cumsum([0] + [len(r) for r in records[:-1]], dtype=np.uint64) if records else []
+
+        self._write_new("docs.jsonl", b"".join(records))
+        self._write_new("offsets.u64", np.asarray(offsets, dtype=np.uint64).tobytes())
+        self._write_new("vectors.f32", np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._write_new("ids.txt", "".join(i + "\n" for i in ids).encode("utf-8"))
+        codes = {key: array[live] for key, array in (self._codes or {}).items()}
+        for key, array in codes.items():
+            self._write_new(f"codes_{key}.bin", np.ascontiguousarray(array).tobytes())
+
+        # commit point: once the plan is on disk the new files win, also after a crash
+        plan = {"replace": ["docs.jsonl", "offsets.u64", "vectors.f32", "ids.txt"] +
+                           [f"codes_{key}.bin" for key in codes],
+                "remove": ["tombstones.i64"]}
+        tmp = self._path(COMPACT_PLAN + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(plan, f)
+            f.flush()
+            os.fsync(f.fileno())
+        self._vectors = self._offsets = None  # drop the maps of the old files
+        os.replace(tmp, self._path(COMPACT_PLAN))
+        self._finish_compact()
+
+        self._ids = ids
+        self._rows = {i: row for row, i in enumerate(ids)}
+        self._deleted = np.zeros(len(ids), dtype=bool)
+        if self._codes is not None:
+            self._codes = codes
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None,
+                   persist_directory="output/db/numpy/", **kwargs):
+        store = cls(persist_directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
@@ -7,20 +7,28 @@ txt_docs = txt.load()
 # recursive text splitter
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=1600, chunk_overlap=200)
+# splitter = RecursiveCharacterTextSplitter(chunk_size=1600, chunk_overlap=200)
+# same chunks, computed on offsets (adds start_index/end_index metadata for highlighting)
+from fast_splitter import FastRecursiveSplitter
+splitter = FastRecursiveSplitter(chunk_size=1600, chunk_overlap=200)
 docs = splitter.split_documents(txt_docs)
 
 # chroma db
 from langchain_ollama.embeddings import OllamaEmbeddings
 from langchain.vectorstores import Chroma
 
-embedding = OllamaEmbeddings(model="nomic-embed-text:latest")
-persist_directory = "outputs/ga_db/chroma/"
+# cache embeddings on disk so unchanged chunks are never sent to the model again
+from embedding_cache import CachedEmbeddings
 
-if os.path.exists(persist_directory):
-    db = Chroma(persist_directory=persist_directory, embedding_function=embedding)
-else:
-    db = Chroma.from_documents(docs, embedding, persist_directory=persist_directory)
+embedding = CachedEmbeddings(OllamaEmbeddings(model="nomic-embed-text:latest"), "output/cache/embeddings.sqlite", batch_size=32, max_workers=4)
+persist_directory = "output/ga_db/chroma/"
+
+# incremental indexing: only new/changed chunks are embedded, removed ones are deleted
+from incremental_index import sync_documents
+
+db = Chroma(persist_directory=persist_directory, embedding_function=embedding)
+stats = sync_documents(db, txt_docs, splitter, persist_directory)
+print(stats)
 
 
 db_retriever = db.as_retriever(search_type="similarity", search_kwargs={"k": 3})
@@ -39,4 +47,56 @@ contextualize_q_system_prompt = (
 )
 
 # Create a prompt template for contextualizing questions
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
\ No newline at end of file
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+contextualize_q_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", contextualize_q_system_prompt),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ]
+)
+
+# History aware retriever
+# skips the rewrite when there is no history / nothing to resolve ("it", "they", ...)
+# and retrieves on the raw question while the LLM rewrites it
+from history_retriever import create_concurrent_history_aware_retriever
+
+history_aware_retriever = create_concurrent_history_aware_retriever(model, db_retriever, contextualize_q_prompt)
+
+# Answer question prompt
+qa_system_prompt = (
+    "You are an assistant for question-answering tasks. Use "
+    "the following pieces of retrieved context to answer the "
+    "question. If you don't know the answer, just say that you "
+    "don't know. Use three sentences maximum and keep the answer "
+    "concise."
+    "\n\n"
+    "{context}"
+)
+
+qa_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", qa_system_prompt),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ]
+)
+
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain.chains.retrieval import create_retrieval_chain
+from langchain_core.messages import AIMessage, HumanMessage
+
+question_answer_chain = create_stuff_documents_chain(model, qa_prompt)
+rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+
+# Chat loop
+chat_history = []
+while True:
+    query = input("You: ")
+    if query.lower() == "exit":
+        break
+    result = rag_chain.invoke({"input": query, "chat_history": chat_history})
+    print("AI:", result["answer"])
+    chat_history.append(HumanMessage(content=query))
+    chat_history.append(AIMessage(content=result["answer"]))
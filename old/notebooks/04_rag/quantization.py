@@ -0,0 +1,128 @@
+"""
+Compressed vector codes for `NumpyVectorStore`.
+
+Both quantizers work on normalized vectors and score with inner products.
+Their codes are what stays in RAM; the float32 rows stay on disk and are only
+read to re-rank a small candidate set exactly.
+
+- Int8Quantizer: one int8 per dimension plus a float32 scale per row (~4x smaller)
+- PQQuantizer: product quantization, `subspaces` uint8 codes per row, each one
+  the nearest of 256 centroids learned for its slice of dimensions
+  (dim / subspaces = 4 gives ~16x, 8 gives ~32x)
+
+Codes are dicts of 2D arrays (one row per vector) so the store can append them
+to one file per key.
+"""
+import numpy as np
+
+
+class Int8Quantizer:
+    name = "int8"
+    trained = True
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def layout(self):
+        return {"codes": (np.int8, self.dim), "scales": (np.float32, 1)}
+
+    def train(self, vectors):
+        pass
+
+    def encode(self, vectors):
+        scales = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+        return {"codes": codes, "scales": scales.astype(np.float32)}
+
+    def scores(self, queries, codes):
+        return (queries @ codes["codes"].T.astype(np.float32)) * codes["scales"][:, 0]
+
+    def state(self):
+        return {}
+
+    def load_state(self, state):
+        pass
+
+
+def kmeans(x, k, iters=20, seed=0):
+    """Plain Lloyd's k-means, returns (k, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=len(x) < k)].copy()
+    for _ in range(iters):
+        dist = (x * x).sum(1)[:, None] - 2 * x @ centroids.T + (centroids * centroids).sum(1)[None]
+        assign = dist.argmin(1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # re-seed empty clusters on random points
+        if not filled.all():
+            centroids[~filled] = x[rng.choice(len(x), (~filled).sum())]
+    return centroids
+
+
+class PQQuantizer:
+    name = "pq"
+    centroids = 256
+
+    def __init__(self, dim, subspaces=None, train_size=20000):
+        subspaces = subspaces or max(1, dim // 4)
+        if dim % subspaces:
+            raise ValueError(f"dim {dim} is not divisible by {subspaces} subspaces")
+        self.dim = dim
+        self.subspaces = subspaces
+        self.width = dim // subspaces
+        self.train_size = train_size
+        self.codebook = None  # (subspaces, 256, width)
+
+    @property
+    def trained(self):
+        return self.codebook is not None
+
+    def layout(self):
+        return {"codes": (np.uint8, self.subspaces)}
+
+    def _split(self, vectors):
+        return vectors.reshape(len(vectors), self.subspaces, self.width)
+
+    def train(self, vectors):
+        if len(vectors) > self.train_size:
+            rng = np.random.default_rng(0)
+            vectors = vectors[rng.choice(len(vectors), self.train_size, replace=False)]
+        parts = self._split(np.asarray(vectors, dtype=np.float32))
+        self.codebook = np.stack([kmeans(parts[:, j], self.centroids) for j in range(self.subspaces)])
+
+    def encode(self, vectors):
+        parts = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for j in range(self.subspaces):
+            book = self.codebook[j]
+            dist = -2 * parts[:, j] @ book.T + (book * book).sum(1)[None]
+            codes[:, j] = dist.argmin(1)
+        return {"codes": codes}
+
+    def scores(self, queries, codes):
+        # asymmetric distance: a (subspaces, 256) table of partial dot products per query
+        tables = np.einsum("qsw,scw->qsc", self._split(queries), self.codebook)
+        columns = np.arange(self.subspaces)
+        return np.stack([table[columns, codes["codes"]].sum(axis=1) for table in tables])
+
+    def state(self):
+        return {"codebook": self.codebook}
+
+    def load_state(self, state):
+        self.codebook = state.get("codebook")
+
+
+def make_quantizer(name, dim, **kwargs):
+    if name == "int8":
+        return Int8Quantizer(dim)
+    if name == "pq":
+        return PQQuantizer(dim, **kwargs)
+    raise ValueError(f"Unknown quantization {name!r}, use 'int8' or 'pq'")
+
+
+def code_bytes(codes):
+    return sum(array.nbytes for array in codes.values())
@@ -16,6 +16,14 @@ webLoader = WebBaseLoader(web_paths=(["https://lilianweng.github.io/posts/2023-0
 web_docs = webLoader.load()
 print(web_docs)
 
+# many pages: concurrent fetching over one pooled client, per host limits and
+# conditional GET (pages unchanged since the last run are skipped)
+from async_web_loader import AsyncWebLoader
+
+asyncWebLoader = AsyncWebLoader(web_paths=["https://lilianweng.github.io/posts/2023-06-23-agent/"], bs_kwargs=dict(parse_only=bs4.SoupStrainer(class_=['post-title', 'post-content', 'post-header'])), per_host_limit=4, validators_path='output/cache/web_validators.json')
+# web_docs = asyncWebLoader.load()   # or `await asyncWebLoader.aload()` inside a notebook
+# pages answering 304 are not in web_docs: sync_documents(..., keep_sources=asyncWebLoader.skipped) keeps their chunks
+
 # loading pdf file
 from langchain_community.document_loaders import PyPDFLoader
 
@@ -24,6 +32,10 @@ pdfLoader = PyPDFLoader('data/attention is all you need.pdf')
 pdf_docs = pdfLoader.load()
 print(pdf_docs)
 
+# many/large pdfs: same documents and metadata, pages extracted across all cores
+# from parallel_pdf import ParallelPyPDFLoader
+# pdf_docs = ParallelPyPDFLoader(['data/attention is all you need.pdf'], pages_per_task=16).load()
+
 
 #--------------------------------------------
 # TEXT SPLITTER
@@ -33,7 +45,10 @@ print(pdf_docs)
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=1600,chunk_overlap=200)
+# splitter = RecursiveCharacterTextSplitter(chunk_size=1600,chunk_overlap=200)
+# same chunks, computed on offsets (adds start_index/end_index metadata for highlighting)
+from fast_splitter import FastRecursiveSplitter
+splitter = FastRecursiveSplitter(chunk_size=1600, chunk_overlap=200)
 docs = splitter.split_documents(txt_docs)
 
 # len(docs)
@@ -46,13 +61,18 @@ docs = splitter.split_documents(txt_docs)
 from langchain_ollama.embeddings import OllamaEmbeddings
 from langchain.vectorstores import Chroma
 
-embedding = OllamaEmbeddings(model='nomic-embed-text:latest')
+# cache embeddings on disk so unchanged chunks are never sent to the model again
+from embedding_cache import CachedEmbeddings
+
+embedding = CachedEmbeddings(OllamaEmbeddings(model='nomic-embed-text:latest'), 'output/cache/embeddings.sqlite', batch_size=32, max_workers=4)
 persist_directory = 'output/db/chroma/'
 
-if os.path.exists(persist_directory):
-    db = Chroma(persist_directory=persist_directory, embedding_function=embedding)
-else:
-    db = Chroma.from_documents(docs, embedding, persist_directory=persist_directory)
+# incremental indexing: only new/changed chunks are embedded, removed ones are deleted
+from incremental_index import sync_documents
+
+db = Chroma(persist_directory=persist_directory, embedding_function=embedding)
+stats = sync_documents(db, txt_docs, splitter, persist_directory)
+print(stats)
 
 
 query = "What does superheros use their powers for?"
@@ -74,6 +94,27 @@ res
 
 # fdb2 = FAISS.load_local(folder_path='output/db/faiss/index.faiss',embeddings=embedding)
 
+#--------------------------------------------
+# NumPy db (memory-mapped, in-process, fast cold start)
+
+# from numpy_store import NumpyVectorStore
+# ndb = NumpyVectorStore('output/db/numpy/', embedding)
+# ndb = NumpyVectorStore('output/db/numpy_pq/', embedding, quantization='pq', rerank_factor=8)  # ~16x less RAM, see bench_quantization.py
+# sync_documents(ndb, txt_docs, splitter, ndb.persist_directory)  # manifest next to whichever store is used
+# res = ndb.similarity_search(query)
+# ndb.batch_similarity_search([query, "Who are authors of attention is all you need research paper?"], k=3)
+# retriever = ndb.as_retriever(search_type="similarity", search_kwargs={"k": 3})
+
+#--------------------------------------------
+# Streaming ingestion (large corpora)
+# loaders are read lazily and embedded in batches while later files are still parsed,
+# so memory stays flat even for multi-GB pdf dumps
+
+# from streaming_ingest import stream_ingest
+# big_db = Chroma(persist_directory='output/db/chroma_stream/', embedding_function=embedding)
+# loaders = [TextLoader("data/super_hero.txt"), PyPDFLoader('data/attention is all you need.pdf'), webLoader]
+# stream_ingest(big_db, loaders, splitter, batch_size=64, on_batch=lambda n, total: print(n, total))
+
 # ----------------------------------------------
 # retriever
 # ----------------------------------------------
@@ -100,11 +141,25 @@ from langchain.chains.combine_documents import create_stuff_documents_chain
 
 doc_chain = create_stuff_documents_chain(llm,prompt)
 
+# token budgeted context: overlapping/near duplicate chunks are dropped and the best ranked
+# chunks are packed until the budget is full, keeps the prompt (and prefill time) bounded
+from context_packing import create_packed_stuff_documents_chain
+
+doc_chain = create_packed_stuff_documents_chain(llm, prompt, max_tokens=1500)
+
 # retriever
 retriever = db.as_retriever()
 
 retriever
 
+# hybrid retriever: BM25 keyword search + vector search merged with reciprocal rank fusion,
+# finds exact names/titles (e.g. "authors of attention is all you need") that embeddings miss
+from hybrid_retriever import BM25Index, HybridRetriever
+
+bm25 = BM25Index('output/db/bm25/index.sqlite')
+sync_documents(bm25, txt_docs, splitter, 'output/db/bm25/')
+retriever = HybridRetriever(vectorstore=db, keyword_index=bm25, k=4)
+
 # retriever chain
 from langchain.chains.retrieval import create_retrieval_chain
 import os
@@ -112,4 +167,16 @@ import os
 retriever_chain = create_retrieval_chain(retriever,doc_chain)
 
 res = retriever_chain.invoke({"input":"What does the superheros uses their super powers for?"})
+res['answer']
+
+# semantic cache: repeated / near identical questions are answered without retrieval or LLM call,
+# cleared automatically when the store is re-indexed
+from semantic_cache import SemanticCache
+from incremental_index import manifest_version
+
+answer_cache = SemanticCache(embedding, threshold=0.95, ttl=3600, max_entries=1000, version=lambda: (manifest_version(persist_directory), manifest_version('output/db/bm25/')))
+cached_chain = answer_cache.wrap(retriever_chain)
+
+res = cached_chain.invoke({"input":"What does the superheros uses their super powers for?"})
+res = cached_chain.invoke({"input":"what do the superheros use their super powers for?"})
 res['answer']
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Semantic result cache for RAG chains.
+
+Looks a question up by exact (normalized) text first and then by cosine
+similarity of its embedding against the cached questions. Entries expire
+after `ttl` seconds, the least recently used ones are dropped past
+`max_entries`, and everything is cleared when `version()` changes, e.g. when
+the vector store was re-indexed. A hit returns the cached result with its
+`input` set to the question actually asked:
+
+    cache = SemanticCache(embedding, threshold=0.95, ttl=3600,
+                          version=lambda: manifest_version(persist_directory))
+    cached_chain = cache.wrap(retriever_chain)
+    cached_chain.invoke({"input": "What do superheros use their powers for?"})
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.runnables import RunnableLambda
+
+
+def normalize_query(text):
+    return " ".join(text.lower().split())
+
+
+class SemanticCache:
+    def __init__(self, embeddings, threshold=0.95, ttl=3600, max_entries=1000, version=None):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = version
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, unit vector, expires at), oldest use first
+        self._expiry = []              # heap of (expires at, key), stale pairs skipped when popped
+        self._matrix = None            # stacked vectors of _entries, rebuilt lazily
+        self._keys = []
+        self._version = version() if version else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry.clear()
+            self._matrix = None
+
+    def _refresh(self, now):
+        # caller holds the lock
+        if self.version:
+            current = self.version()
+            if current != self._version:
+                self._entries.clear()
+                self._expiry.clear()
+                self._version = current
+                self._matrix = None
+        # the heap only touches the expired entries, not every entry on every lookup
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            expires, key = heapq.heappop(expiry)
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] == expires:  # not re-added or evicted since
+                del self._entries[key]
+                self._matrix = None
+
+    def _embed(self, query):
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, query):
+        """Returns (cached value or None, query vector or None)."""
+        key = normalize_query(query)
+        with self._lock:
+            self._refresh(time.monotonic())
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0], None
+            empty = not self._entries
+
+        vector = self._embed(query)
+        with self._lock:
+            if empty:
+                self.misses += 1
+                return None, vector
+            if self._matrix is None:
+                self._keys = list(self._entries)
+                self._matrix = np.stack([self._entries[k][1] for k in self._keys]) if self._keys else None
+            if self._matrix is not None:
+                scores = self._matrix @ vector
+                best = int(scores.argmax())
+                match = self._keys[best]
+                if scores[best] >= self.threshold and match in self._entries:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match][0], vector
+            self.misses += 1
+        return None, vector
+
+    def update(self, query, value, vector=None, version=None):
+        """
+        version: `version()` from before `value` was computed; a value computed against
+                 an older version (re-indexed meanwhile) is not stored
+        """
+        if vector is None:
+            vector = self._embed(query)
+        key = normalize_query(query)
+        now = time.monotonic()
+        expires = now + self.ttl
+        with self._lock:
+            self._refresh(now)
+            if self.version and version is not None and version != self._version:
+                return
+            self._entries[key] = (value, vector, expires)
+            self._entries.move_to_end(key)
+            heapq.heappush(self._expiry, (expires, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if len(self._expiry) > 2 * len(self._entries) + 64:
+                # pairs of evicted / overwritten entries pile up, rebuild from the live ones
+                self._expiry = [(e[2], k) for k, e in self._entries.items()]
+                heapq.heapify(self._expiry)
+            self._matrix = None
+
+    def wrap(self, chain, input_key="input"):
+        """Runnable that answers from the cache and only calls `chain` on a miss."""
+        def cached(inputs, config=None):
+            query = inputs[input_key]
+            version = self.version() if self.version else None
+            value, vector = self.lookup(query)
+            if value is None:
+                value = chain.invoke(inputs, config)
+                self.update(query, value, vector, version)
+            elif isinstance(value, dict) and input_key in value:
+                # the answer of a similar question: report the question actually asked
+                value = {**value, input_key: query}
+            return value
+
+        return RunnableLambda(cached, name="SemanticCache")
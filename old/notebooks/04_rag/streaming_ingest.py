@@ -0,0 +1,93 @@
+"""
+Streaming, bounded-memory ingestion: load -> split -> embed -> upsert.
+
+Loaders are consumed through `lazy_load()` one document (pdf page, text file,
+web page) at a time, split right away and grouped into fixed size batches.
+A producer thread does the parsing/splitting and hands batches to the caller's
+thread through a bounded queue, so:
+
+- embedding of the first batch starts while later files are still parsed
+- when embedding is slower than parsing the producer blocks (backpressure)
+- at most `batch_size * (max_pending + 2)` chunks are held in memory
+"""
+import queue
+import threading
+from itertools import count, islice
+
+from incremental_index import chunk_ids
+
+_DONE = object()
+
+
+def iter_documents(loaders):
+    """Yields documents from every loader without materialising the lists."""
+    for loader in loaders:
+        yield from loader.lazy_load()
+
+
+def iter_chunks(documents, splitter):
+    """Splits documents one at a time, yielding (id, chunk) pairs."""
+    for doc in documents:
+        chunks = splitter.split_documents([doc])
+        # the page keeps ids unique when the same text shows up on several pages
+        key = f"{doc.metadata.get('source', '')}#{doc.metadata.get('page', '')}"
+        yield from zip(chunk_ids(key, chunks), chunks)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _put(out, item, stop):
+    # a timeout keeps checking `stop` so a failed consumer never leaves us blocked
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(batches, out, stop):
+    try:
+        for batch in batches:
+            if not _put(out, batch, stop):
+                return
+        _put(out, _DONE, stop)
+    except BaseException as e:
+        _put(out, e, stop)
+
+
+def stream_ingest(db, loaders, splitter, batch_size=64, max_pending=2, on_batch=None):
+    """Ingests every loader into `db` batch by batch and returns the chunk count.
+
+    db: any LangChain vector store (`add_documents(docs, ids=...)`)
+    max_pending: number of split batches allowed to wait for embedding
+    on_batch: optional callback `(batch_number, total_chunks)` for progress
+    """
+    batches = batched(iter_chunks(iter_documents(loaders), splitter), batch_size)
+    pending = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(batches, pending, stop), daemon=True)
+    producer.start()
+
+    total = 0
+    try:
+        for number in count(1):
+            item = pending.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            ids = [i for i, _ in item]
+            db.add_documents([c for _, c in item], ids=ids)
+            total += len(item)
+            if on_batch:
+                on_batch(number, total)
+    finally:
+        stop.set()
+        producer.join()
+    return total
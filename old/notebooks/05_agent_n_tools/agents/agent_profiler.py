@@ -0,0 +1,254 @@
+"""
+Where does an agent run spend its time?
+
+`AgentProfiler` is a callback handler recording a span tree per agent run:
+LLM calls (with token counts), output parsing (failed parses and the retries
+`handle_parsing_errors=True` triggers) and tool calls. Finished runs go into
+a ring buffer of the last `max_runs` runs, exportable as JSON or as a Chrome
+trace (open in chrome://tracing or https://ui.perfetto.dev).
+
+    profiler = AgentProfiler(max_runs=200)
+    agent_executor.invoke({"input": question}, config={"callbacks": [profiler]})
+    print(profiler.last_run_line())   # one line instead of verbose=True output
+    print(profiler.summary())         # p50/p95 and what the slowest runs spent time on
+    profiler.save_chrome_trace("output/traces/agent.json")
+
+Timestamps are `perf_counter_ns()`; a span is a small object created at start
+and closed at end, nothing is formatted until you export.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+KINDS = ("llm", "parse", "tool")
+
+
+class Span:
+    __slots__ = ("name", "kind", "start", "end", "attrs", "children")
+
+    def __init__(self, name, kind, **attrs):
+        self.name = name
+        self.kind = kind
+        self.start = time.perf_counter_ns()
+        self.end = None
+        self.attrs = attrs
+        self.children = []
+
+    @property
+    def duration_ms(self):
+        return ((self.end or time.perf_counter_ns()) - self.start) / 1e6
+
+    def walk(self, depth=0):
+        yield self, depth
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    def to_dict(self, origin=None):
+        origin = self.start if origin is None else origin
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": (self.start - origin) / 1e6,
+            "duration_ms": self.duration_ms,
+            **({"attrs": self.attrs} if self.attrs else {}),
+            **({"children": [c.to_dict(origin) for c in self.children]} if self.children else {}),
+        }
+
+    def time_by_kind(self):
+        """
+        wall clock ms per kind: the union of its spans, so nested spans of the same
+        kind and overlapping siblings (tools run concurrently) are not counted twice
+        """
+        now = time.perf_counter_ns()
+        intervals = {kind: [] for kind in KINDS}
+        for span, _ in self.walk():
+            if span.kind in intervals:
+                intervals[span.kind].append((span.start, span.end or now))
+
+        totals = {}
+        for kind, spans in intervals.items():
+            total, covered = 0, None  # covered: end of the merged interval so far
+            for start, end in sorted(spans):
+                if covered is not None and start < covered:
+                    start = covered
+                if end > start:
+                    total += end - start
+                    covered = end
+            totals[kind] = total / 1e6
+        return totals
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+class AgentProfiler(BaseCallbackHandler):
+    run_inline = True  # record in the caller's thread, no executor hop in async runs
+
+    def __init__(self, max_runs=100):
+        self.runs = deque(maxlen=max_runs)
+        self._open = {}  # run_id -> Span
+        self._lock = threading.Lock()
+
+    # ---- span bookkeeping ----------------------------------------------
+
+    def _begin(self, run_id, parent_run_id, name, kind, **attrs):
+        span = Span(name, kind, **attrs)
+        with self._lock:
+            self._open[run_id] = span
+            parent = self._open.get(parent_run_id) if parent_run_id else None
+            if parent is not None:
+                parent.children.append(span)
+            else:
+                span.attrs["root"] = True
+        return span
+
+    def _end(self, run_id, **attrs):
+        with self._lock:
+            span = self._open.pop(run_id, None)
+            if span is None:
+                return None
+            span.end = time.perf_counter_ns()
+            span.attrs.update(attrs)
+            if span.attrs.pop("root", False):
+                self.runs.append(span)
+        return span
+
+    @staticmethod
+    def _name(serialized, kwargs, default):
+        return kwargs.get("name") or (serialized or {}).get("name") or default
+
+    # ---- chains (agent run, agent runnable, output parser) -------------
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        name = self._name(serialized, kwargs, "chain")
+        kind = "parse" if "OutputParser" in name else "chain"
+        self._begin(run_id, parent_run_id, name, kind)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        span = self._end(run_id, error=type(error).__name__)
+        if span is not None and span.kind == "parse":
+            span.attrs["parse_failed"] = True
+
+    def on_agent_action(self, action, *, run_id, **kwargs):
+        # handle_parsing_errors sends the parse error back to the llm as an "_Exception" tool call
+        if action.tool == "_Exception":
+            with self._lock:
+                span = self._open.get(run_id)
+                if span is not None:
+                    span.attrs["parse_retries"] = span.attrs.get("parse_retries", 0) + 1
+
+    # ---- llm -----------------------------------------------------------
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._begin(run_id, parent_run_id, self._name(serialized, kwargs, "llm"), "llm")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._begin(run_id, parent_run_id, self._name(serialized, kwargs, "chat_model"), "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        tokens = {"prompt_tokens": usage.get("prompt_tokens"), "completion_tokens": usage.get("completion_tokens")}
+        if tokens["prompt_tokens"] is None:
+            message = getattr(response.generations[0][0], "message", None) if response.generations else None
+            meta = getattr(message, "usage_metadata", None) or {}
+            tokens = {"prompt_tokens": meta.get("input_tokens"), "completion_tokens": meta.get("output_tokens")}
+        self._end(run_id, **{k: v for k, v in tokens.items() if v is not None})
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    # ---- tools ---------------------------------------------------------
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = self._name(serialized, kwargs, "tool")
+        # "_Exception" is the parse error handed back to the llm, not a real tool
+        self._begin(run_id, parent_run_id, name, "parse" if name == "_Exception" else "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    # ---- reports -------------------------------------------------------
+
+    def to_dict(self):
+        with self._lock:
+            return [run.to_dict() for run in self.runs]
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_chrome_trace(self):
+        """Trace Event Format: one row (tid) per run, spans as complete ("X") events."""
+        events = []
+        with self._lock:
+            runs = list(self.runs)
+        for tid, run in enumerate(runs):
+            for span, depth in run.walk():
+                events.append({
+                    "name": span.name, "cat": span.kind, "ph": "X", "pid": 1, "tid": tid,
+                    "ts": span.start / 1000, "dur": ((span.end or span.start) - span.start) / 1000,
+                    "args": {**span.attrs, "depth": depth},
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+    def last_run_line(self):
+        """e.g. `AgentExecutor 2341 ms | llm 2x 1980 ms (812 tok) | tool 1x 310 ms | parse 0 failed`"""
+        if not self.runs:
+            return "no runs yet"
+        run = self.runs[-1]
+        counts = dict.fromkeys(KINDS, 0)
+        tokens = failed = 0
+        for span, _ in run.walk():
+            if span.kind in counts:
+                counts[span.kind] += 1
+            tokens += span.attrs.get("prompt_tokens", 0) + span.attrs.get("completion_tokens", 0)
+            failed += bool(span.attrs.get("parse_failed"))
+        totals = run.time_by_kind()
+        return (f"{run.name} {run.duration_ms:.0f} ms | llm {counts['llm']}x {totals['llm']:.0f} ms ({tokens} tok) | "
+                f"tool {counts['tool']}x {totals['tool']:.0f} ms | parse {failed} failed")
+
+    def breakdown(self, q=0.95):
+        """Average ms per kind over all runs and over the runs at or above the q-quantile."""
+        with self._lock:
+            runs = list(self.runs)
+        if not runs:
+            return {}
+        threshold = _percentile([r.duration_ms for r in runs], q)
+        slow = [r for r in runs if r.duration_ms >= threshold]
+
+        def average(group):
+            totals = dict.fromkeys(KINDS, 0.0)
+            for run in group:
+                for kind, ms in run.time_by_kind().items():
+                    totals[kind] += ms / len(group)
+            totals["other"] = max(0.0, sum(r.duration_ms for r in group) / len(group) - sum(totals.values()))
+            return totals
+
+        return {"runs": len(runs), "threshold_ms": threshold, "all": average(runs), "slow": average(slow)}
+
+    def summary(self, q=0.95):
+        report = self.breakdown(q)
+        if not report:
+            return "no runs yet"
+        durations = [r.duration_ms for r in self.runs]
+        slow = report["slow"]
+        dominant = max(slow, key=slow.get)
+        parts = ", ".join(f"{kind} {ms:.0f} ms" for kind, ms in slow.items())
+        return (f"{report['runs']} runs, p50 {_percentile(durations, 0.5):.0f} ms, p{int(q * 100)} {report['threshold_ms']:.0f} ms\n"
+                f"slowest runs spend: {parts} -> mostly {dominant}")
@@ -0,0 +1,90 @@
+"""
+Benchmark: one agent step calling Wikipedia and Google Search, one after the
+other (`AgentExecutor`) vs at the same time (`ConcurrentAgentExecutor`).
+
+Offline: a fake tool calling model asks for both tools in its first step and
+answers in the second, the tools sleep `--wikipedia` / `--google` seconds. The
+agent is built like gc.py (`create_tool_calling_agent`, bundled
+`hwchase17/openai-tools-agent` prompt). The last run has one worker and a
+timeout a bit above the slowest tool: the call waiting for the worker must
+not time out, its timeout starts when it runs.
+
+    python notebooks/05_agent_n_tools/agents/bench_concurrent_tools.py --wikipedia 0.5 --google 1.0
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Iterator
+
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import Tool
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'utils'))
+from concurrent_executor import ConcurrentAgentExecutor
+from prompt_registry import load_prompt
+
+
+class FakeToolCallingModel(BaseChatModel):
+    messages: Iterator[AIMessage]
+
+    @property
+    def _llm_type(self):
+        return "fake-tool-calling"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=next(self.messages))])
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def make_model():
+    calls = [{"name": "wikipedia", "args": {"__arg1": "Nepal"}, "id": "call_1"},
+             {"name": "google_search", "args": {"__arg1": "Nepal news"}, "id": "call_2"}]
+    return FakeToolCallingModel(messages=iter([AIMessage(content="", tool_calls=calls),
+                                               AIMessage(content="Nepal is a country in South Asia.")]))
+
+
+def make_tools(wikipedia, google):
+    def sleeper(seconds, answer):
+        def run(query):
+            time.sleep(seconds)
+            return answer
+        return run
+
+    return [Tool(name="wikipedia", func=sleeper(wikipedia, "Nepal is a landlocked country."),
+                 description="encyclopedia"),
+            Tool(name="google_search", func=sleeper(google, "https://example.com/nepal"),
+                 description="web search")]
+
+
+def run(executor_class, args, **kwargs):
+    tools = make_tools(args.wikipedia, args.google)
+    agent = create_tool_calling_agent(make_model(), tools, load_prompt("hwchase17/openai-tools-agent"))
+    executor = executor_class.from_agent_and_tools(agent=agent, tools=tools, return_intermediate_steps=True,
+                                                   **kwargs)
+    start = time.perf_counter()
+    res = executor.invoke({"input": "Tell me about Nepal"})
+    return time.perf_counter() - start, [str(step[1]) for step in res["intermediate_steps"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wikipedia", type=float, default=0.5, help="seconds the wikipedia tool takes")
+    parser.add_argument("--google", type=float, default=1.0, help="seconds the google tool takes")
+    args = parser.parse_args()
+    slowest = max(args.wikipedia, args.google)
+
+    sequential, _ = run(AgentExecutor, args)
+    concurrent, _ = run(ConcurrentAgentExecutor, args, max_workers=8)
+    queued, observations = run(ConcurrentAgentExecutor, args, max_workers=1, tool_timeout=slowest * 1.2)
+
+    print(f"tools: wikipedia {args.wikipedia:.2f}s, google {args.google:.2f}s, slowest {slowest:.2f}s")
+    print(f"AgentExecutor            {sequential:6.2f}s  (sum of the tools)")
+    print(f"ConcurrentAgentExecutor  {concurrent:6.2f}s  (slowest tool)")
+    timed_out = sum("timed out" in o for o in observations)
+    print(f"1 worker, timeout {slowest * 1.2:.2f}s {queued:6.2f}s  {timed_out} of {len(observations)} calls timed out")
@@ -0,0 +1,108 @@
+"""
+AgentExecutor running the tool calls of one agent step at the same time.
+
+`AgentExecutor.invoke` runs the actions of a step one after another (only
+`ainvoke` gathers them), so a step asking for Wikipedia and Google Search
+costs the sum of both. `ConcurrentAgentExecutor`:
+
+- sync: runs the step's tool calls on a bounded thread pool (`max_workers`)
+- async: gathers them as before, tools without a coroutine run in the loop's
+  default executor
+- gives each tool call `tool_timeout` seconds (per tool name via
+  `tool_timeouts`), counted from when it starts running, not while it waits
+  for a worker; a call that takes longer becomes a "timed out" observation
+  and the agent carries on
+- returns the observations in the order the agent asked for them
+
+    agent_executor = ConcurrentAgentExecutor.from_agent_and_tools(
+        agent=agent, tools=tools, max_workers=8, tool_timeout=20, handle_parsing_errors=True)
+
+Only agents that return several actions per step benefit, e.g. tool calling
+agents (`create_tool_calling_agent`, used by gc.py and google_chat_agent.py);
+ReAct / structured chat agents ask for one tool at a time.
+`python bench_concurrent_tools.py` times a two-tool step.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict, Optional
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentStep
+from pydantic import PrivateAttr
+
+
+class ConcurrentAgentExecutor(AgentExecutor):
+    max_workers: int = 8
+    tool_timeout: Optional[float] = 30.0
+    tool_timeouts: Dict[str, float] = {}
+
+    _pool: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+    _pool_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _deferring: threading.local = PrivateAttr(default_factory=threading.local)
+
+    def _timeout(self, tool_name):
+        return self.tool_timeouts.get(tool_name, self.tool_timeout)
+
+    def _timed_out(self, agent_action):
+        return AgentStep(action=agent_action,
+                         observation=f"Tool '{agent_action.tool}' timed out after {self._timeout(agent_action.tool)}s")
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent-tool")
+            return self._pool
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        if not getattr(self._deferring, "on", False):
+            return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+        # inside _iter_next_step: start the call and hand back the future
+        perform = super()._perform_agent_action
+        started = threading.Event()
+
+        def run():
+            started.at = time.monotonic()  # the timeout counts from here, not from the queue
+            started.set()
+            return perform(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+        future = self._get_pool().submit(run)
+        future.agent_action = agent_action
+        future.started = started
+        return future
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        # the base step yields all actions first and then performs them one by one,
+        # deferring makes each perform return at once so they all run together
+        pending = []
+        self._deferring.on = True
+        try:
+            for item in super()._iter_next_step(name_to_tool_map, color_mapping, inputs,
+                                                intermediate_steps, run_manager):
+                if isinstance(item, Future):
+                    pending.append(item)
+                else:
+                    yield item
+        finally:
+            self._deferring.on = False
+        for future in pending:
+            timeout = remaining = self._timeout(future.agent_action.tool)
+            if timeout is not None:
+                future.started.wait()  # queued behind max_workers busy calls: not counted
+                remaining = max(0.0, future.started.at + timeout - time.monotonic())
+            try:
+                step = future.result(timeout=remaining)
+            except FutureTimeout:
+                # the thread keeps running until the tool returns, its result is dropped
+                step = self._timed_out(future.agent_action)
+            yield step
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        try:
+            return await asyncio.wait_for(
+                super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager),
+                self._timeout(agent_action.tool))
+        except asyncio.TimeoutError:
+            return self._timed_out(agent_action)
@@ -1,29 +1,25 @@
 from dotenv import load_dotenv
-from langchain import hub
-from langchain.agents import AgentExecutor, create_structured_chat_agent
-from langchain_core.tools import Tool,tool
-from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from googlesearch import search
-from serpapi import GoogleSearch
 import os
+import sys
 
+# shared helpers live in notebooks/utils
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'utils'))
+# langchain takes about a second to import: it is only imported in build_agent below,
+# which runs on a background thread while the first question is typed
+# providers (openai, google, serpapi, googlesearch, wikipedia) are imported on first use
+from providers import chat_model, lazy, search_backend
+from tool_cache import ToolCache, cached_tool
 
-@tool
+
+# custom tools: plain functions, turned into langchain tools in build_agent
 def search_google(query):
     """Searches Google and returns the first valid search result using SerpAPI."""
     try:
         print(f"[DEBUG] Tool 'Google Search' called with query: {query}")
-        params = {
-            "q": query,
-            "api_key": os.environ.get("SERP_API_KEY"),
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-
-        if "organic_results" in results and results["organic_results"]:
-            top_result = results["organic_results"][0]["link"]
+        results = search_backend("serpapi")(query, num_results=1)
+
+        if results:
+            top_result = results[0]
             print("our result: ", top_result)
             return top_result
 
@@ -36,34 +32,35 @@ def search_google(query):
 
 load_dotenv()
 
+# agents repeat the same lookups: results are kept for a day (also across runs),
+# concurrent identical lookups share one request, error messages are not cached
+tool_cache = ToolCache(max_entries=1024, ttl=24 * 3600, path="output/cache/tools.sqlite")
+
+def is_answer(result):
+    return not result.startswith(("I couldn't find", "No valid results"))
+
 
-# custom tools:
-@tool
 def get_current_time(*args, **kwargs):
     """Returns the current time in H:MM AM/PM format."""
     import datetime  # Import datetime module to get current time
 
     now = datetime.datetime.now()  # Get current time
     return now.strftime("%I:%M %p")  # Format time in H:MM AM/PM format
-@tool
+@cached_tool(cache=tool_cache, cache_if=is_answer)
 def search_wikipedia(query):
     """Searches Wikipedia and returns the summary of the first result."""
-    from wikipedia import summary
-
     try:
-        return summary(query, sentences=2) # Limit to two sentences for brevity
+        return search_backend("wikipedia")(query, sentences=2) # Limit to two sentences for brevity
     except:
         return "I couldn't find any information on that."
 
-@tool
+@cached_tool(cache=tool_cache, cache_if=is_answer)
 def search_google(query):
     """Searches Google and returns the first valid result."""
     try:
         print(f"[DEBUG] Tool 'Google Search' called with query: {query}")
-        results = list(search(query, num_results=3))
-
-        # Filter out empty strings and unwanted results
-        filtered_results = [url for url in results if url.strip()]
+        # empty strings are filtered out by the backend
+        filtered_results = search_backend("googlesearch")(query, num_results=3)
 
         if not filtered_results:
             return "No valid results found."
@@ -75,72 +72,105 @@ def search_google(query):
         return f"I couldn't find any information on that. Error: {e}"
 
 
-# create tools
-tools = [
-    # Tool(
-    #     name="Current Time",  # Name of the tool
-    #     func=get_current_time,  # Function that the tool will execute
-    #     description="Useful for when you need to know the current time",  # Description of the tool
-    # ),
-    Tool(
-        name="Wikipedia",
-        func=search_wikipedia,
-        description="Provides general knowledge and historical information about well-known topics. Does NOT include the latest updates or real-time news.",
-    ),
-    Tool(
-        name="Google Search",
-        func=search_google,
-        description="Finds the latest updates, real-time news, and information not covered by Wikipedia. Use this for fresh, trending, or time-sensitive topics.",
+@lazy
+def build_agent():
+    from langchain.agents import create_tool_calling_agent
+    from langchain.memory import ConversationBufferMemory
+    from langchain_core.messages import SystemMessage
+    from langchain_core.tools import Tool
+
+    from agent_profiler import AgentProfiler
+    from concurrent_executor import ConcurrentAgentExecutor
+    from prompt_registry import load_prompt
+
+    # create tools (tool calling apis only take names without spaces)
+    tools = [
+        # Tool(
+        #     name="Current Time",  # Name of the tool
+        #     func=get_current_time,  # Function that the tool will execute
+        #     description="Useful for when you need to know the current time",  # Description of the tool
+        # ),
+        Tool(
+            name="wikipedia",
+            func=search_wikipedia,
+            description="Provides general knowledge and historical information about well-known topics. Does NOT include the latest updates or real-time news.",
+        ),
+        Tool(
+            name="google_search",
+            func=search_google,
+            description="Finds the latest updates, real-time news, and information not covered by Wikipedia. Use this for fresh, trending, or time-sensitive topics.",
+        )
+    ]
+
+
+    # model and prompt for creating agent
+
+    # Load the correct JSON Chat Prompt from the hub
+    # prompt = hub.pull("hwchase17/structured-chat-agent")
+    # bundled/cached copy instead of a network round trip on every start; the tool calling
+    # prompt, the structured chat one asks for a single json action per step
+    prompt = load_prompt("hwchase17/openai-tools-agent")
+
+    # Initialize a ChatOpenAI model
+    # llm = ChatOpenAI(model="gpt-4o-mini")
+    llm = chat_model("openai", model="gpt-4o-mini")
+
+    # Create a structured Chat Agent with Conversation Buffer Memory
+    # ConversationBufferMemory stores the conversation history, allowing the agent to maintain context across interactions
+    memory = ConversationBufferMemory(
+        memory_key="chat_history", return_messages=True)
+
+    # create_tool_calling_agent uses the model's native tool calls: one step can ask for Wikipedia
+    # and Google Search together, ConcurrentAgentExecutor then runs both at once
+    # (create_structured_chat_agent asked for one tool per step, so they always ran one after the other)
+    agent = create_tool_calling_agent(llm=llm, tools=tools, prompt=prompt)
+
+    # create agent executor
+    # span tree per run (llm calls + tokens, parse retries, tool calls), last 200 runs kept
+    profiler = AgentProfiler(max_runs=200)
+
+    # tool calls of one step run concurrently (thread pool), each limited to tool_timeout seconds
+    agent_executor = ConcurrentAgentExecutor.from_agent_and_tools(
+        agent=agent,
+        tools=tools,
+        max_workers=8,
+        tool_timeout=20,
+        verbose=False,  # replaced by the profiler: timings instead of printed text
+        memory=memory, # use memory to store conversation history and maintain context
+        handle_parsing_errors=True, # handle parsing errors
     )
-]
-
-
-# model and prompt for creating agent
-
-# Load the correct JSON Chat Prompt from the hub
-prompt = hub.pull("hwchase17/structured-chat-agent")
-
-# Initialize a ChatOpenAI model
-llm = ChatOpenAI(model="gpt-4o-mini")
 
-# Create a structured Chat Agent with Conversation Buffer Memory
-# ConversationBufferMemory stores the conversation history, allowing the agent to maintain context across interactions
-memory = ConversationBufferMemory(
-    memory_key="chat_history", return_messages=True)
 
-# create_structured_chat_agent initializes a chat agent designed to interact using a structured prompt and tools
-# It combines the language model (llm), tools, and prompt to create an interactive agent
-agent = create_structured_chat_agent(llm=llm, tools=tools, prompt=prompt)
+    # run agent
+    # Initial system message to set the context for the chat
+    # SystemMessage is used to define a message from the system to the agent, setting initial instructions or context
+    initial_message = "You are an AI assistant that can provide helpful answers using available tools.\nIf you are unable to answer, you can use the following tools: wikipedia, google_search."
+    memory.chat_memory.add_message(SystemMessage(content=initial_message))
 
-# create agent executor
-agent_executor = AgentExecutor.from_agent_and_tools(
-    agent=agent,
-    tools=tools,
-    verbose=True,
-    memory=memory, # use memory to store conversation history and maintain context
-    handle_parsing_errors=True, # handle parsing errors
-)
+    return agent_executor, memory, profiler
 
 
-# run agent
-# Initial system message to set the context for the chat
-# SystemMessage is used to define a message from the system to the agent, setting initial instructions or context
-initial_message = "You are an AI assistant that can provide helpful answers using available tools.\nIf you are unable to answer, you can use the following tools:  Google Search."
-memory.chat_memory.add_message(SystemMessage(content=initial_message))
+# imported by main.py for build_agent, the chat loop only runs as a script
+if __name__ == "__main__":
+    build_agent.warm()  # imports and builds in the background, input() below does not wait for it
 
 
-# Chat Loop to interact with the user
-while True:
-    user_input = input("User: ")
-    if user_input.lower() == "exit":
-        break
+    # Chat Loop to interact with the user
+    while True:
+        user_input = input("User: ")
+        agent_executor, memory, profiler = build_agent()  # ready by now, unless the question was typed very fast
+        if user_input.lower() == "exit":
+            print(profiler.summary())
+            profiler.save_chrome_trace("output/traces/gc.json")  # chrome://tracing or ui.perfetto.dev
+            break
 
-    # Add the user's message to the conversation memory
-    memory.chat_memory.add_message(HumanMessage(content=user_input))
+        # Add the user's message to the conversation memory
+        memory.chat_memory.add_user_message(user_input)
 
-    # Invoke the agent with the user input and the current chat history
-    response = agent_executor.invoke({"input": user_input})
-    print("Bot:", response["output"])
+        # Invoke the agent with the user input and the current chat history
+        response = agent_executor.invoke({"input": user_input}, config={"callbacks": [profiler]})
+        print("Bot:", response["output"])
+        print(profiler.last_run_line())
 
-    # Add the agent's response to the conversation memory
-    memory.chat_memory.add_message(AIMessage(content=response["output"]))
\ No newline at end of file
+        # Add the agent's response to the conversation memory
+        memory.chat_memory.add_ai_message(response["output"])
\ No newline at end of file
@@ -1,83 +1,130 @@
 from dotenv import load_dotenv
-from langchain import hub
-from langchain.agents import AgentExecutor, create_structured_chat_agent
-from langchain.memory import ConversationBufferMemory
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from langchain_core.tools import StructuredTool
-from pydantic import BaseModel
-from langchain_google_genai import ChatGoogleGenerativeAI
-from googlesearch import search
+import os
+import sys
+
+# shared helpers live in notebooks/utils
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'utils'))
+# langchain takes about a second to import: it is only imported in build_agent below,
+# which runs on a background thread while the first question is typed
+# providers (google, googlesearch, wikipedia) are imported on first use
+from providers import chat_model, lazy, search_backend
 
 
 load_dotenv()
 
 # custom tools:
+def wikipedia(query: str):
+    """Searches Wikipedia and returns the summary of the first result."""
+    try:
+        return search_backend("wikipedia")(query, sentences=2)
+    except Exception as e:
+        return f"I couldn't find any information on that. Error: {e}"
+
+
 def google_search(query: str):
     """Searches Google and returns the summary of the first result."""
     try:
         print(f"[DEBUG] Tool 'Google Search' called with query: {query}")
-        results = list(search(query, num_results=1))
+        results = search_backend("googlesearch")(query, num_results=1)
         return results[0] if results else "No results found."
     except Exception as e:
         return f"I couldn't find any information on that. Error: {e}"
 
-# Define argument schema for the tool
-class GoogleSearchArgs(BaseModel):
-    query: str
-
-# tools creation
-tools = [
-    StructuredTool(
-        name="Google Search",  # Name of the tool
-        func=google_search,  # Function that the tool will execute
-        description="Useful for when you need to search for information on Google",  # Description of the tool
-        args_schema=GoogleSearchArgs,  # Argument schema for the tool
-    ),
-]
-
-# model and prompt for creating agent
-
-# Load the correct JSON Chat Prompt from the hub
-prompt = hub.pull("hwchase17/structured-chat-agent")
-
-# Initialize a ChatGoogleGenerativeAI model
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-lite-preview-02-05")
-
-# Create a structured Chat Agent with Conversation Buffer Memory
-# ConversationBufferMemory stores the conversation history, allowing the agent to maintain context across interactions
-memory = ConversationBufferMemory(
-    memory_key="chat_history", return_messages=True)
-
-# create_structured_chat_agent initializes a chat agent designed to interact using a structured prompt and tools
-# It combines the language model (llm), tools, and prompt to create an interactive agent
-agent = create_structured_chat_agent(llm=llm, tools=tools, prompt=prompt)
-
-# create agent executor
-agent_executor = AgentExecutor.from_agent_and_tools(
-    agent=agent,
-    tools=tools,
-    verbose=True,
-    memory=memory,  # use memory to store conversation history and maintain context
-    handle_parsing_errors=True,  # handle parsing errors
-)
-
-# run agent
-# Initial system message to set the context for the chat
-# SystemMessage is used to define a message from the system to the agent, setting initial instructions or context
-initial_message = "You are an AI assistant that can provide helpful answers using available tools.\nIf you are unable to answer, you can use the following tools: Google Search."
-memory.chat_memory.add_message(SystemMessage(content=initial_message))
-
-while True:
-    user_input = input("User: ")
-    if user_input.lower() == "exit":
-        break
-    
-    # Add user message to memory
-    memory.chat_memory.add_message(HumanMessage(content=user_input))
-
-    # Invoke the agent with the current chat history
-    response = agent_executor.invoke({"input": user_input})
-    print("Bot:", response["output"])
-
-    # Add the bot response to memory
-    memory.chat_memory.add_message(AIMessage(content=response["output"]))
+@lazy
+def build_agent():
+    from langchain.agents import create_tool_calling_agent
+    from langchain.memory import ConversationBufferMemory
+    from langchain_core.messages import SystemMessage
+    from langchain_core.tools import StructuredTool
+    from pydantic import BaseModel
+
+    from agent_profiler import AgentProfiler
+    from concurrent_executor import ConcurrentAgentExecutor
+    from prompt_registry import load_prompt
+
+    # Define argument schema for the tools
+    class SearchArgs(BaseModel):
+        query: str
+
+    # tools creation (tool calling apis only take names without spaces)
+    tools = [
+        StructuredTool(
+            name="google_search",  # Name of the tool
+            func=google_search,  # Function that the tool will execute
+            description="Useful for when you need to search for information on Google",  # Description of the tool
+            args_schema=SearchArgs,  # Argument schema for the tool
+        ),
+        StructuredTool(
+            name="wikipedia",
+            func=wikipedia,
+            description="Provides general knowledge and historical information about well-known topics",
+            args_schema=SearchArgs,
+        ),
+    ]
+
+    # model and prompt for creating agent
+
+    # Load the correct JSON Chat Prompt from the hub
+    # prompt = hub.pull("hwchase17/structured-chat-agent")
+    # bundled/cached copy instead of a network round trip on every start; the tool calling
+    # prompt, the structured chat one asks for a single json action per step
+    prompt = load_prompt("hwchase17/openai-tools-agent")
+
+    # Initialize a ChatGoogleGenerativeAI model
+    # llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-lite-preview-02-05")
+    llm = chat_model("google", model="gemini-2.0-flash-lite-preview-02-05")
+
+    # Create a structured Chat Agent with Conversation Buffer Memory
+    # ConversationBufferMemory stores the conversation history, allowing the agent to maintain context across interactions
+    memory = ConversationBufferMemory(
+        memory_key="chat_history", return_messages=True)
+
+    # create_tool_calling_agent uses gemini's function calls: one step can ask for Google and
+    # Wikipedia together, ConcurrentAgentExecutor then runs both at once
+    agent = create_tool_calling_agent(llm=llm, tools=tools, prompt=prompt)
+
+    # create agent executor
+    # span tree per run (llm calls + tokens, parse retries, tool calls), last 200 runs kept
+    profiler = AgentProfiler(max_runs=200)
+
+    # tool calls of one step run concurrently, a hanging search gives up after tool_timeout seconds
+    agent_executor = ConcurrentAgentExecutor.from_agent_and_tools(
+        agent=agent,
+        tools=tools,
+        tool_timeout=20,
+        verbose=False,  # replaced by the profiler: timings instead of printed text
+        memory=memory,  # use memory to store conversation history and maintain context
+        handle_parsing_errors=True,  # handle parsing errors
+    )
+
+    # run agent
+    # Initial system message to set the context for the chat
+    # SystemMessage is used to define a message from the system to the agent, setting initial instructions or context
+    initial_message = "You are an AI assistant that can provide helpful answers using available tools.\nIf you are unable to answer, you can use the following tools: google_search, wikipedia."
+    memory.chat_memory.add_message(SystemMessage(content=initial_message))
+
+    return agent_executor, memory, profiler
+
+
+# imported by main.py for build_agent, the chat loop only runs as a script
+if __name__ == "__main__":
+    build_agent.warm()  # imports and builds in the background, input() below does not wait for it
+
+    while True:
+        user_input = input("User: ")
+        agent_executor, memory, profiler = build_agent()  # ready by now, unless the question was typed very fast
+        if user_input.lower() == "exit":
+            print(profiler.summary())
+            profiler.save_chrome_trace("output/traces/google_chat_agent.json")  # chrome://tracing or ui.perfetto.dev
+            break
+
+        # Add user message to memory
+        memory.chat_memory.add_user_message(user_input)
+
+        # Invoke the agent with the current chat history
+        response = agent_executor.invoke({"input": user_input}, config={"callbacks": [profiler]})
+        print("Bot:", response["output"])
+        print(profiler.last_run_line())
+
+        # Add the bot response to memory
+        memory.chat_memory.add_ai_message(response["output"])
@@ -0,0 +1,225 @@
+"""
+Result cache for agent tools.
+
+`cached_tool` wraps a plain function, a `@tool` object, a `Tool` or a
+`StructuredTool`. Results are kept in a bounded LRU with a TTL, optionally
+backed by a sqlite file shared across runs and processes. Identical calls
+running at the same time share one request: the first caller does the lookup
+and the others wait for its result.
+
+    @cached_tool(ttl=24 * 3600, path="output/cache/tools.sqlite")
+    @tool
+    def search_wikipedia(query):
+        ...
+
+    wiki = cached_tool(Tool(name="Wikipedia", func=search_wikipedia, description="..."), ttl=3600)
+
+Only results `cache_if(result)` accepts are stored (by default: not an
+exception, not empty); the tools here turn errors into "I couldn't find ..."
+strings, pass a `cache_if` that rejects those.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class ToolCache:
+    """LRU + TTL store, with an optional sqlite file behind it."""
+
+    def __init__(self, max_entries=1024, ttl=3600.0, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._items = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = self.misses = 0
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS tool_results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """(found, value)"""
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                if item[0] > now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return True, item[1]
+                del self._items[key]
+        if self.path:
+            row = self._conn().execute(
+                "SELECT value, expires FROM tool_results WHERE key = ? AND expires > ?", (key, now)).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                with self._lock:
+                    self.hits += 1
+                return True, value
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def _remember(self, key, value, expires):
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl
+        self._remember(key, value, expires)
+        if self.path:
+            try:
+                data = json.dumps(value)
+            except TypeError:
+                return  # not json, memory only
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO tool_results VALUES (?, ?, ?)", (key, data, expires))
+            # drop expired rows now and then
+            if hash(key) % 100 == 0:
+                conn.execute("DELETE FROM tool_results WHERE expires <= ?", (time.time(),))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        if self.path:
+            self._conn().execute("DELETE FROM tool_results")
+
+
+def _default_cache_if(result):
+    return result is not None and result != ""
+
+
+# passed by the tool machinery per run, not part of the query
+RUNTIME_KWARGS = {"callbacks", "run_manager", "config"}
+
+
+def _make_key(name, args, kwargs):
+    kwargs = {k: v for k, v in kwargs.items() if k not in RUNTIME_KWARGS}
+    try:
+        data = json.dumps([args, kwargs], sort_keys=True, default=str)
+    except TypeError:
+        data = repr((args, sorted(kwargs.items())))
+    return f"{name}:{hashlib.sha256(data.encode('utf-8')).hexdigest()}"
+
+
+def _wrap_sync(func, name, cache, cache_if):
+    inflight = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = _make_key(name, args, kwargs)
+        found, value = cache.get(key)
+        if found:
+            return value
+        with lock:
+            future = inflight.get(key)
+            owner = future is None
+            if owner:
+                future = inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if cache_if(value):
+                cache.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with lock:
+                inflight.pop(key, None)
+
+    return wrapper
+
+
+def _wrap_async(coroutine, name, cache, cache_if):
+    inflight = {}  # per key, only valid in the loop that created it
+
+    @functools.wraps(coroutine)
+    async def wrapper(*args, **kwargs):
+        key = _make_key(name, args, kwargs)
+        found, value = cache.get(key)
+        if found:
+            return value
+        loop = asyncio.get_running_loop()
+        future = inflight.get((loop, key))
+        if future is not None:
+            return await asyncio.shield(future)
+        future = inflight[(loop, key)] = loop.create_future()
+        try:
+            value = await coroutine(*args, **kwargs)
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()  # mark retrieved when nobody else waits
+            raise
+        else:
+            if cache_if(value):
+                cache.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            inflight.pop((loop, key), None)
+
+    return wrapper
+
+
+def cached_tool(target=None, *, ttl=3600.0, max_entries=1024, path=None, cache=None, cache_if=_default_cache_if):
+    """
+    Caches a function or tool; usable as `@cached_tool`, `@cached_tool(...)`
+    or `cached_tool(tool, ...)`. Tools are copied, the original is left alone.
+
+    cache: a `ToolCache` to share between tools (keys include the tool name)
+           or to read `hits`/`misses` from; wrapped functions also expose it as `.cache`
+    """
+    if target is None:
+        return functools.partial(cached_tool, ttl=ttl, max_entries=max_entries, path=path,
+                                 cache=cache, cache_if=cache_if)
+    cache = cache or ToolCache(max_entries=max_entries, ttl=ttl, path=path)
+
+    # langchain_core.tools is slow to import; if it is not loaded, target is no tool
+    tools = sys.modules.get("langchain_core.tools")
+    if tools is not None and isinstance(target, tools.BaseTool):
+        update = {}
+        if getattr(target, "func", None) is not None:
+            update["func"] = _wrap_sync(target.func, target.name, cache, cache_if)
+        if getattr(target, "coroutine", None) is not None:
+            update["coroutine"] = _wrap_async(target.coroutine, target.name, cache, cache_if)
+        if not update:
+            raise TypeError(f"cached_tool: {type(target).__name__} has no func/coroutine to wrap")
+        return target.model_copy(update=update)
+
+    name = getattr(target, "__qualname__", repr(target))
+    if asyncio.iscoroutinefunction(target):
+        wrapped = _wrap_async(target, name, cache, cache_if)
+    else:
+        wrapped = _wrap_sync(target, name, cache, cache_if)
+    wrapped.cache = cache
+    return wrapped
@@ -1,10 +1,14 @@
 from dotenv import load_dotenv
-from langchain import hub
-from langchain.agents import AgentExecutor, create_structured_chat_agent
-from langchain_core.tools import Tool  
-from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+import os
+import sys
+
+# shared helpers live in notebooks/utils
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'utils'))
+# langchain takes about a second to import: it is only imported in build_agent below,
+# which runs on a background thread while the first question is typed
+# providers (openai, wikipedia) are imported on first use
+from providers import chat_model, lazy, search_backend
+from tool_cache import cached_tool
 
 
 load_dotenv()
@@ -18,78 +22,104 @@ def get_current_time(*args, **kwargs):
     now = datetime.datetime.now()  # Get current time
     return now.strftime("%I:%M %p")  # Format time in H:MM AM/PM format
 
+# same query again (this session or a later run) -> no wikipedia request; failures are not cached
+@cached_tool(ttl=24 * 3600, path="output/cache/tools.sqlite", cache_if=lambda res: not res.startswith("I couldn't find"))
 def search_wikipedia(query):
     """Searches Wikipedia and returns the summary of the first result."""
-    from wikipedia import summary
-
     try:
-        return summary(query, sentences=2) # Limit to two sentences for brevity
+        return search_backend("wikipedia")(query, sentences=2) # Limit to two sentences for brevity
     except:
         return "I couldn't find any information on that."
 
 
 
-# create tools
-tools = [
-    # Tool(
-    #     name="Current Time",  # Name of the tool
-    #     func=get_current_time,  # Function that the tool will execute
-    #     description="Useful for when you need to know the current time",  # Description of the tool
-    # ),
-    Tool(
-        name="Wikipedia",  # Name of the tool
-        func=search_wikipedia,  # Function that the tool will execute
-        description="Useful for when you need to know information about a topic",  # Description of the tool
-    ),
-]
-
-
-# model and prompt for creating agent
-
-# Load the correct JSON Chat Prompt from the hub
-prompt = hub.pull("hwchase17/structured-chat-agent")
-
-# Initialize a ChatOpenAI model
-llm = ChatOpenAI(model="gpt-4o-mini")
-
-# Create a structured Chat Agent with Conversation Buffer Memory
-# ConversationBufferMemory stores the conversation history, allowing the agent to maintain context across interactions
-memory = ConversationBufferMemory(
-    memory_key="chat_history", return_messages=True)
-
-# create_structured_chat_agent initializes a chat agent designed to interact using a structured prompt and tools
-# It combines the language model (llm), tools, and prompt to create an interactive agent
-agent = create_structured_chat_agent(llm=llm, tools=tools, prompt=prompt)
-
-# create agent executor
-agent_executor = AgentExecutor.from_agent_and_tools(
-    agent=agent,
-    tools=tools,
-    verbose=True,
-    memory=memory, # use memory to store conversation history and maintain context
-    handle_parsing_errors=True, # handle parsing errors
-)
-
-
-# run agent
-# Initial system message to set the context for the chat
-# SystemMessage is used to define a message from the system to the agent, setting initial instructions or context
-initial_message = "You are an AI assistant that can provide helpful answers using available tools.\nIf you are unable to answer, you can use the following tools: Time and Wikipedia."
-memory.chat_memory.add_message(SystemMessage(content=initial_message))
-
-
-# Chat Loop to interact with the user
-while True:
-    user_input = input("User: ")
-    if user_input.lower() == "exit":
-        break
-
-    # Add the user's message to the conversation memory
-    memory.chat_memory.add_message(HumanMessage(content=user_input))
-
-    # Invoke the agent with the user input and the current chat history
-    response = agent_executor.invoke({"input": user_input})
-    print("Bot:", response["output"])
-
-    # Add the agent's response to the conversation memory
-    memory.chat_memory.add_message(AIMessage(content=response["output"]))
\ No newline at end of file
+@lazy
+def build_agent():
+    from langchain.agents import AgentExecutor, create_structured_chat_agent
+    from langchain.memory import ConversationBufferMemory
+    from langchain_core.messages import SystemMessage
+    from langchain_core.tools import Tool
+
+    from agent_profiler import AgentProfiler
+    from prompt_registry import load_prompt
+
+    # create tools
+    tools = [
+        # Tool(
+        #     name="Current Time",  # Name of the tool
+        #     func=get_current_time,  # Function that the tool will execute
+        #     description="Useful for when you need to know the current time",  # Description of the tool
+        # ),
+        Tool(
+            name="Wikipedia",  # Name of the tool
+            func=search_wikipedia,  # Function that the tool will execute
+            description="Useful for when you need to know information about a topic",  # Description of the tool
+        ),
+    ]
+
+
+    # model and prompt for creating agent
+
+    # Load the correct JSON Chat Prompt from the hub
+    # prompt = hub.pull("hwchase17/structured-chat-agent")
+    # bundled/cached copy instead of a network round trip on every start
+    prompt = load_prompt("hwchase17/structured-chat-agent")
+
+    # Initialize a ChatOpenAI model
+    # llm = ChatOpenAI(model="gpt-4o-mini")
+    llm = chat_model("openai", model="gpt-4o-mini")
+
+    # Create a structured Chat Agent with Conversation Buffer Memory
+    # ConversationBufferMemory stores the conversation history, allowing the agent to maintain context across interactions
+    memory = ConversationBufferMemory(
+        memory_key="chat_history", return_messages=True)
+
+    # create_structured_chat_agent initializes a chat agent designed to interact using a structured prompt and tools
+    # It combines the language model (llm), tools, and prompt to create an interactive agent
+    agent = create_structured_chat_agent(llm=llm, tools=tools, prompt=prompt)
+
+    # create agent executor
+    # span tree per run (llm calls + tokens, parse retries, tool calls), last 200 runs kept
+    profiler = AgentProfiler(max_runs=200)
+
+    agent_executor = AgentExecutor.from_agent_and_tools(
+        agent=agent,
+        tools=tools,
+        verbose=False,  # replaced by the profiler: timings instead of printed text
+        memory=memory, # use memory to store conversation history and maintain context
+        handle_parsing_errors=True, # handle parsing errors
+    )
+
+
+    # run agent
+    # Initial system message to set the context for the chat
+    # SystemMessage is used to define a message from the system to the agent, setting initial instructions or context
+    initial_message = "You are an AI assistant that can provide helpful answers using available tools.\nIf you are unable to answer, you can use the following tools: Time and Wikipedia."
+    memory.chat_memory.add_message(SystemMessage(content=initial_message))
+
+    return agent_executor, memory, profiler
+
+
+# imported by main.py for build_agent, the chat loop only runs as a script
+if __name__ == "__main__":
+    build_agent.warm()  # imports and builds in the background, input() below does not wait for it
+
+    # Chat Loop to interact with the user
+    while True:
+        user_input = input("User: ")
+        agent_executor, memory, profiler = build_agent()  # ready by now, unless the question was typed very fast
+        if user_input.lower() == "exit":
+            print(profiler.summary())
+            profiler.save_chrome_trace("output/traces/wiki_chat_agent.json")  # chrome://tracing or ui.perfetto.dev
+            break
+
+        # Add the user's message to the conversation memory
+        memory.chat_memory.add_user_message(user_input)
+
+        # Invoke the agent with the user input and the current chat history
+        response = agent_executor.invoke({"input": user_input}, config={"callbacks": [profiler]})
+        print("Bot:", response["output"])
+        print(profiler.last_run_line())
+
+        # Add the agent's response to the conversation memory
+        memory.chat_memory.add_ai_message(response["output"])
\ No newline at end of file
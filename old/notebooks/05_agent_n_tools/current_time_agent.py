@@ -1,5 +1,10 @@
 import dotenv
-from langchain import hub
+import os
+import sys
+
+# shared helpers live in notebooks/utils
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from prompt_registry import load_prompt
 from langchain.agents import (
     AgentExecutor,
     create_react_agent,
@@ -31,7 +36,9 @@ tools = [
 # Pull the prompt template from the hub
 # ReAct = Reason and Action
 # https://smith.langchain.com/hub/hwchase17/react
-prompt = hub.pull("hwchase17/react")
+# prompt = hub.pull("hwchase17/react")
+# bundled/cached copy instead of a network round trip on every start
+prompt = load_prompt("hwchase17/react")
 
 # Initialize a ChatOpenAI model
 llm = ChatOpenAI(
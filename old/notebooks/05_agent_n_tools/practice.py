@@ -1,6 +1,11 @@
 from dotenv import load_dotenv
 from langchain_core.tools import Tool
-from langchain import hub
+import os
+import sys
+
+# shared helpers live in notebooks/utils
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+from prompt_registry import load_prompt
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain_openai import ChatOpenAI
 
@@ -27,7 +32,9 @@ tools = [
 ]
 
 # model and prompt for creating agent
-prompt = hub.pull("hwchase17/react")
+# prompt = hub.pull("hwchase17/react")
+# bundled/cached copy instead of a network round trip on every start
+prompt = load_prompt("hwchase17/react")
 llm = ChatOpenAI(
     model="gpt-4o-mini", temperature=0
 )
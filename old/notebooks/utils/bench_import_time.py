@@ -0,0 +1,156 @@
+"""
+Benchmark: import time of the agent and RAG entry points.
+
+Runs the module-level imports of each script (the scripts themselves start
+chat loops, so only their `import` / `from ... import` statements are
+executed) in a fresh interpreter under `python -X importtime`, and reports
+the total and the slowest top-level packages. Imports that fail (package not
+installed) are listed and skipped.
+
+    python notebooks/utils/bench_import_time.py                        # default entry points, checked against BUDGET_MS
+    python notebooks/utils/bench_import_time.py --rev HEAD~1           # same scripts as of an older commit
+    python notebooks/utils/bench_import_time.py --budget-ms 1500 --json output/bench/import_time.json
+
+Exits with 1 when a script's startup imports take longer than its budget in
+`BUDGET_MS` (or `--budget-ms` for every script), so a regression fails CI.
+`--json` appends one record per run to track the numbers over time.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+NOTEBOOKS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO = os.path.dirname(os.path.dirname(NOTEBOOKS))
+
+ENTRY_POINTS = [
+    "old/notebooks/05_agent_n_tools/agents/gc.py",
+    "old/notebooks/05_agent_n_tools/agents/wiki_chat_agent.py",
+    "old/notebooks/05_agent_n_tools/agents/google_chat_agent.py",
+    "old/notebooks/04_rag/rag_basic.py",
+    "main.py",
+]
+
+# startup budget per entry point (ms, module-level imports only). The agents build
+# everything langchain on a background thread, so their prompt must appear at once;
+# rag_basic is a notebook run top to bottom and needs its loaders right away.
+BUDGET_MS = {
+    "old/notebooks/05_agent_n_tools/agents/gc.py": 200,
+    "old/notebooks/05_agent_n_tools/agents/wiki_chat_agent.py": 200,
+    "old/notebooks/05_agent_n_tools/agents/google_chat_agent.py": 200,
+    "old/notebooks/04_rag/rag_basic.py": 3000,
+    "main.py": 800,
+}
+
+# helpers imported by bare module name, see the sys.path lines in the scripts
+SEARCH_DIRS = [os.path.join(NOTEBOOKS, "utils"), os.path.join(NOTEBOOKS, "04_rag")]
+
+MARKER = "-- script imports --"
+
+RUNNER = """
+import sys, time
+missing = []
+sys.stderr.write({marker!r} + "\\n"); sys.stderr.flush()
+start = time.perf_counter()
+for stmt in {statements!r}:
+    try:
+        exec(stmt, {{}})
+    except Exception as e:
+        missing.append(getattr(e, "name", None) or stmt)
+print(repr((time.perf_counter() - start, missing)))
+"""
+
+
+def read_source(path, rev=None):
+    if rev is None:
+        with open(os.path.join(REPO, path), encoding="utf-8") as f:
+            return f.read()
+    return subprocess.run(["git", "show", f"{rev}:{path}"], cwd=REPO, capture_output=True, text=True,
+                          check=True).stdout
+
+
+def top_level_imports(source):
+    """Source of every import statement at module level, in order."""
+    tree = ast.parse(source)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def parse_importtime(stderr):
+    """
+    cumulative us per top-level package the script imports directly (interpreter
+    startup is left out); a module shared by two packages counts for the first one
+    """
+    packages = defaultdict(int)
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    for line in lines:
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # nesting shows as two extra spaces per level, direct imports have one
+        if name.startswith("  "):
+            continue
+        packages[name.strip().split(".")[0]] += int(cumulative)
+    return packages
+
+
+def measure(path, rev=None, repeat=3):
+    statements = top_level_imports(read_source(path, rev))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [os.path.join(REPO, os.path.dirname(path))] + SEARCH_DIRS + [os.environ.get("PYTHONPATH", "")]))
+    code = RUNNER.format(marker=MARKER, statements=statements)
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                              cwd=os.path.join(REPO, "old"), env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{path}: {proc.stderr.strip().splitlines()[-1]}")
+        seconds, missing = ast.literal_eval(proc.stdout.strip().splitlines()[-1])
+        if best is None or seconds < best[0]:
+            best = (seconds, missing, parse_importtime(proc.stderr))
+    seconds, missing, packages = best
+    return {"script": path, "rev": rev, "statements": len(statements), "total_ms": seconds * 1000,
+            "missing": missing, "packages_ms": {k: v / 1000 for k, v in packages.items()}}
+
+
+def report(result, top):
+    print(f"{result['script']}{' @ ' + result['rev'] if result['rev'] else ''}: "
+          f"{result['total_ms']:.0f} ms ({result['statements']} import statements)")
+    slowest = sorted(result["packages_ms"].items(), key=lambda kv: -kv[1])[:top]
+    for package, ms in slowest:
+        print(f"    {package:<28} {ms:8.1f} ms")
+    if result["missing"]:
+        print(f"    not installed, skipped: {', '.join(map(str, result['missing']))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("scripts", nargs="*", default=ENTRY_POINTS, help="paths relative to the repo root")
+    parser.add_argument("--rev", default=None, help="measure the scripts as of this git revision")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per script, the fastest counts")
+    parser.add_argument("--top", type=int, default=8, help="slowest packages shown per script")
+    parser.add_argument("--budget-ms", type=float, default=None, help="budget for every script instead of BUDGET_MS")
+    parser.add_argument("--json", default=None, help="append the results to this file (one json line per run)")
+    args = parser.parse_args()
+
+    results = [measure(script, args.rev, args.repeat) for script in args.scripts]
+    for result in results:
+        report(result, args.top)
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.time(), "python": sys.version.split()[0], "results": results}) + "\n")
+
+    over = False
+    for r in results:
+        budget = args.budget_ms if args.budget_ms is not None else BUDGET_MS.get(r["script"])
+        if budget is not None and r["total_ms"] > budget:
+            print(f"over budget: {r['script']} {r['total_ms']:.0f} ms > {budget:.0f} ms")
+            over = True
+    sys.exit(1 if over else 0)
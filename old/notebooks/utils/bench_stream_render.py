@@ -0,0 +1,106 @@
+"""
+Benchmark: rendering every streamed token vs StreamRenderer.
+
+Replays a generated answer token by token at `--rate` tokens/sec into a fake
+Streamlit placeholder (escapes and serializes the full text, like
+`placeholder.markdown` does before sending it to the browser) and into a
+terminal writer, then reports render calls, bytes sent and CPU time per
+response.
+
+    python notebooks/utils/bench_stream_render.py --tokens 2000 --rate 200
+"""
+import argparse
+import html
+import io
+import json
+import random
+import time
+
+from stream_render import StreamRenderer
+
+
+def make_tokens(count, seed=0):
+    rng = random.Random(seed)
+    words = "the model attends to every token in the sequence and learns which positions matter".split()
+    tokens = []
+    for i in range(count):
+        token = " " + rng.choice(words)
+        if rng.random() < 0.03:
+            token += ".\n\n"
+        tokens.append(token)
+    return tokens
+
+
+class FakePlaceholder:
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+
+    def markdown(self, text):
+        payload = json.dumps({"body": html.escape(text)})
+        self.calls += 1
+        self.bytes += len(payload)
+
+
+def replay(tokens, rate, write):
+    gap = 1 / rate
+    next_at = time.perf_counter()
+    for token in tokens:
+        next_at += gap
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        write(token)
+
+
+def run(tokens, rate, mode, interval):
+    placeholder = FakePlaceholder()
+    terminal = io.StringIO()
+    cpu = time.process_time()
+    if mode == "ui-every-token":
+        state = {"text": ""}
+
+        def write(token):
+            state["text"] += token
+            placeholder.markdown(state["text"] + "|")
+
+        replay(tokens, rate, write)
+        placeholder.markdown(state["text"])
+    elif mode == "ui-throttled":
+        renderer = StreamRenderer(placeholder.markdown, interval=interval, cursor="|")
+        replay(tokens, rate, renderer.write)
+        renderer.close()
+    elif mode == "terminal-every-token":
+        def write(token):
+            terminal.write(token)
+            terminal.flush()
+            placeholder.calls += 1
+            placeholder.bytes += len(token)
+
+        replay(tokens, rate, write)
+    else:
+        def render(new):
+            terminal.write(new)
+            terminal.flush()
+            placeholder.calls += 1
+            placeholder.bytes += len(new)
+
+        renderer = StreamRenderer(render, interval=interval, delta=True)
+        replay(tokens, rate, renderer.write)
+        renderer.close()
+    return placeholder.calls, placeholder.bytes, time.process_time() - cpu
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200, help="tokens per second of the fake model")
+    parser.add_argument("--interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    print(f"{args.tokens} tokens at {args.rate:.0f} tok/s, {len(''.join(tokens)) / 1000:.1f}k chars, "
+          f"render interval {args.interval * 1000:.0f} ms")
+    for mode in ("ui-every-token", "ui-throttled", "terminal-every-token", "terminal-throttled"):
+        calls, sent, cpu = run(tokens, args.rate, mode, args.interval)
+        print(f"{mode:22} {calls:6} renders  {sent / 1e6:8.2f} MB sent  cpu {cpu * 1000:8.1f} ms")
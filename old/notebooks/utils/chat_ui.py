@@ -1,9 +1,10 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
-import shelve
-from langchain_ollama import ChatOllama
-import subprocess
+from stream_metrics import StreamMetrics
+from session_store import SessionStore
+from model_registry import ModelRegistry, get_chat_model
+from stream_render import render_stream
 
 load_dotenv()
 
@@ -13,54 +14,61 @@ USER_AVATAR = "👤"
 BOT_AVATAR = "🤖"
 # Initialize Ollama model
 
-# Function to get the installed Ollama models using subprocess
-def get_ollama_models():
-    try:
-        result = subprocess.run(['ollama', 'list'], capture_output=True, text=True, check=True)
-        lines = result.stdout.splitlines()
-        model_names = []
-        for line in lines[1:]:
-            parts = line.split()
-            if parts:
-                model_name_with_version = parts[0]
-                model_name = model_name_with_version.split(':')[0]
-                model_names.append(model_name)
-        return model_names
-    except subprocess.CalledProcessError as e:
-        print(f"Error occurred: {e}")
-        return []
+# generation metrics, shared by every session of this process
+@st.cache_resource
+def get_stream_metrics():
+    return StreamMetrics()
 
-# List of installed Ollama models
-installed_models = get_ollama_models()
+metrics = get_stream_metrics()
+
+# `ollama list` ran on every rerun (each click/keystroke), the registry caches it for the process
+@st.cache_resource
+def get_model_registry():
+    return ModelRegistry(ttl=60)
+
+installed_models = get_model_registry().models()
 
 
 
 
 # model = ChatOllama(model="hf.co/SicariusSicariiStuff/Phi-3.5-mini-instruct_Uncensored_GGUFs:Q4_K_M", temperature=0.4)
 
-# Load chat history from shelve file
-def load_chat_history():
-    with shelve.open("chat_history") as db:
-        return db.get("messages", [])
+# chat history in an append-only sqlite store: saving a message is one insert
+# (shelve re-pickled the whole history every rerun) and many workers can share it
+@st.cache_resource
+def get_session_store():
+    store = SessionStore("output/chat/sessions.sqlite")
+    # the history the shelve version saved in ./chat_history, moved over on the first start
+    store.import_shelve("chat_history")
+    return store
 
-# Save chat history to shelve file
-def save_chat_history(messages):
-    with shelve.open("chat_history") as db:
-        db["messages"] = messages
+store = get_session_store()
+session_id = st.query_params.get("session", "default")
+PAGE_SIZE = 100
 
-# Initialize or load chat history
+# Initialize or load chat history (latest page only)
 if "messages" not in st.session_state:
-    st.session_state.messages = load_chat_history()
+    st.session_state.messages = store.load(session_id, limit=PAGE_SIZE)
 
 # Sidebar with a button to delete chat history
 with st.sidebar:
     # Model selection
     selected_model = st.selectbox("Select Ollama Model", installed_models)
-    model = ChatOllama(model=selected_model, temperature=0.4)
+    # model = ChatOllama(model=selected_model, temperature=0.4)
+    model = get_chat_model(selected_model, temperature=0.4)  # reused across reruns
 
     if st.button("Delete Chat History"):
         st.session_state.messages = []
-        save_chat_history([])
+        store.delete(session_id)
+
+    if st.session_state.messages and st.button("Load older messages"):
+        first_id = st.session_state.messages[0]["id"]
+        st.session_state.messages = store.load(session_id, limit=PAGE_SIZE, before=first_id) + st.session_state.messages
+
+    with st.expander("Generation metrics"):
+        st.text(metrics.summary() or "no answers yet")
+        st.download_button("Prometheus", metrics.to_prometheus(), file_name="metrics.prom")
+        st.download_button("JSON", metrics.to_json(indent=2), file_name="metrics.json")
 
 # Display chat messages
 for message in st.session_state.messages:
@@ -70,23 +78,18 @@ for message in st.session_state.messages:
 
 # Main chat interface
 if prompt := st.chat_input("How can I help?"):
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    st.session_state.messages.append({"id": store.append(session_id, "user", prompt), "role": "user", "content": prompt})
     with st.chat_message("user", avatar=USER_AVATAR):
         st.markdown(prompt)
 
     with st.chat_message("assistant", avatar=BOT_AVATAR):
         message_placeholder = st.empty()
 
-        full_response = ""
-        
-        for response in model.stream(prompt):
-            full_response += response.content
-            message_placeholder.markdown(full_response + "|")
-            
-        
-
-        message_placeholder.markdown(full_response)
-    st.session_state.messages.append({"role": "assistant", "content": full_response})
-
-# Save chat history after each interaction
-save_chat_history(st.session_state.messages)
+        # full_response = ""
+        # for response in model.stream(prompt):
+        #     full_response += response.content
+        #     message_placeholder.markdown(full_response + "|")
+        # re-rendering the whole answer per token is O(n^2): render ~20 times a second instead
+        full_response = render_stream(metrics.measure(model.stream(prompt), model=selected_model),
+                                      message_placeholder.markdown, interval=0.05, cursor="|")
+    st.session_state.messages.append({"id": store.append(session_id, "assistant", full_response), "role": "assistant", "content": full_response})
@@ -0,0 +1,97 @@
+"""
+Installed Ollama models and ChatOllama clients, cached for the whole process.
+
+Streamlit reruns the script on every interaction; with these the rerun does
+not spawn `ollama list` nor build a new client (and HTTP connection pool).
+
+    registry = ModelRegistry(ttl=60)
+    registry.models()                          # cached, refreshed in the background when stale
+    model = get_chat_model("phi3.5", temperature=0.4)   # same instance for the same arguments
+
+The list comes from the Ollama HTTP API (`/api/tags`) and falls back to the
+`ollama list` CLI when the python client can not reach the server.
+"""
+import logging
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_ollama import ChatOllama
+
+logger = logging.getLogger(__name__)
+
+
+def list_ollama_models(base_url=None):
+    """Installed model names with the tag, e.g. `phi3.5:latest`."""
+    try:
+        from ollama import Client
+
+        return sorted(getattr(m, "model", None) or m["name"] for m in Client(host=base_url).list()["models"])
+    except Exception:
+        result = subprocess.run(["ollama", "list"], capture_output=True, text=True, check=True, timeout=10)
+        return sorted(line.split()[0] for line in result.stdout.splitlines()[1:] if line.split())
+
+
+class ModelRegistry:
+    def __init__(self, ttl=60.0, fetch=list_ollama_models):
+        self.ttl = ttl
+        self.fetch = fetch
+        self._models = None
+        self._fetched = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _refresh(self):
+        try:
+            models = self.fetch()
+        except Exception as e:
+            logger.warning("refresh failed, keeping the old list: %s", e)
+            models = None
+        with self._lock:
+            if models is not None or self._models is None:
+                self._models = models or []
+            self._fetched = time.monotonic()
+            self._refreshing = False
+
+    def models(self):
+        """Cached model list; a stale list is returned as is while a refresh runs in the background."""
+        with self._lock:
+            first = self._models is None
+            stale = time.monotonic() - self._fetched > self.ttl
+            start = stale and not self._refreshing
+            if start:
+                self._refreshing = True
+        if first and start:
+            self._refresh()  # nothing to show yet, wait for it once
+        elif start:
+            threading.Thread(target=self._refresh, daemon=True, name="model-registry").start()
+        elif first:
+            # another thread does the first fetch
+            while self._models is None:
+                time.sleep(0.01)
+        return list(self._models)
+
+    def invalidate(self):
+        """Next `models()` call refreshes (e.g. after `ollama pull`)."""
+        with self._lock:
+            self._fetched = 0.0
+
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+MAX_CLIENTS = 16
+
+
+def get_chat_model(model, **params):
+    """Shared ChatOllama per (model, params); its http client keeps connections open between reruns."""
+    key = (model, tuple(sorted(params.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = ChatOllama(model=model, **params)
+            while len(_clients) > MAX_CLIENTS:
+                _clients.popitem(last=False)
+        else:
+            _clients.move_to_end(key)
+        return client
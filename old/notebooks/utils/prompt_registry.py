@@ -0,0 +1,180 @@
+"""
+Local prompt registry, a drop-in for `hub.pull` that does not need the network.
+
+    from prompt_registry import load_prompt
+    prompt = load_prompt("hwchase17/structured-chat-agent")   # was hub.pull(...)
+
+`load_prompt` resolves, in order:
+
+1. the cache directory (`output/prompts/`, `PROMPT_CACHE` env var), filled by `pull`
+2. the copies bundled with the repo (`utils/prompts/`)
+3. only with `allow_network=True`: `hub.pull`, saved to the cache for next time
+
+"owner/name:commit" pins a hub commit, it only resolves to a file pulled at
+that commit. Every file holds the sha256 of its prompt and each directory has
+a `prompts.lock.json` pinning the hash per name: the committed one in
+`utils/prompts/` for the bundled copies, one in the cache directory for
+pulled copies. A file that does not match its directory's lock raises instead
+of silently running an edited prompt.
+
+    python notebooks/utils/prompt_registry.py pull hwchase17/react   # refresh from the hub into this machine's cache
+    python notebooks/utils/prompt_registry.py pull --bundle hwchase17/react   # into utils/prompts/ + its lock, to commit
+    python notebooks/utils/prompt_registry.py verify
+"""
+import hashlib
+import json
+import os
+import sys
+import warnings
+
+BUNDLED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+LOCK_NAME = "prompts.lock.json"
+LOCK_PATH = os.path.join(BUNDLED_DIR, LOCK_NAME)
+
+
+def _split(ref):
+    name, _, commit = ref.partition(":")
+    return name, commit or None
+
+
+def _filename(name, commit=None):
+    return name.replace("/", "__") + (f"@{commit}" if commit else "") + ".json"
+
+
+def prompt_hash(serialized):
+    """sha256 of the canonical json of a serialized prompt."""
+    canonical = json.dumps(serialized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class PromptRegistry:
+    def __init__(self, cache_dir=None, bundled_dir=BUNDLED_DIR, lock_path=LOCK_PATH, allow_network=False):
+        self.cache_dir = os.path.normpath(cache_dir or os.environ.get("PROMPT_CACHE", "output/prompts"))
+        self.bundled_dir = os.path.normpath(bundled_dir)
+        self.lock_path = lock_path
+        self.allow_network = allow_network
+        self._loaded = {}
+
+    def _lock_path(self, directory):
+        """The bundled copies are pinned by the committed lock, the cache by its own."""
+        return self.lock_path if directory == self.bundled_dir else os.path.join(directory, LOCK_NAME)
+
+    def _lock(self, directory):
+        path = self._lock_path(directory)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _read(self, path, ref):
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+        digest = prompt_hash(entry["prompt"])
+        if digest != entry["sha256"]:
+            raise ValueError(f"prompt {ref}: {path} was modified (sha256 {digest}, file says {entry['sha256']})")
+        name, commit = _split(ref)
+        lock_path = self._lock_path(os.path.dirname(path))
+        pinned = self._lock(os.path.dirname(path)).get(name)
+        if commit is None and pinned and pinned["sha256"] != digest:
+            raise ValueError(f"prompt {ref}: {path} does not match {lock_path} "
+                             f"(sha256 {digest}, locked {pinned['sha256']}), run `pull` or `verify`")
+        # imported here, langchain_core.load adds ~100 ms to the start of every script using the registry
+        from langchain_core._api import LangChainBetaWarning
+        from langchain_core.load import loads
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            return loads(json.dumps(entry["prompt"]))
+
+    def load(self, ref):
+        """Prompt for "owner/name" or "owner/name:commit"."""
+        if ref in self._loaded:
+            return self._loaded[ref]
+        name, commit = _split(ref)
+        for directory in (self.cache_dir, self.bundled_dir):
+            path = os.path.join(directory, _filename(name, commit))
+            if os.path.exists(path):
+                prompt = self._loaded[ref] = self._read(path, ref)
+                return prompt
+        if not self.allow_network:
+            raise FileNotFoundError(f"prompt {ref} is not cached or bundled; run "
+                                    f"`python notebooks/utils/prompt_registry.py pull {ref}` once")
+        prompt = self._loaded[ref] = self.pull(ref, update_lock=False)
+        return prompt
+
+    def pull(self, ref, update_lock=True, bundle=False):
+        """
+        Fetches `ref` from the hub into the cache (and pins its hash in the cache's lock file).
+        bundle: write it to the bundled copies and the committed lock instead, to commit with the repo
+        """
+        from langchain import hub
+        from langchain_core.load import dumps
+
+        prompt = hub.pull(ref)
+        name, commit = _split(ref)
+        serialized = json.loads(dumps(prompt))
+        entry = {"name": name, "commit": commit, "source": "hub", "sha256": prompt_hash(serialized),
+                 "prompt": serialized}
+        directory = self.bundled_dir if bundle else self.cache_dir
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, _filename(name, commit))
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp, path)
+        if update_lock and commit is None:
+            lock = self._lock(directory)
+            lock[name] = {"sha256": entry["sha256"], "source": "hub"}
+            lock_path = self._lock_path(directory)
+            with open(lock_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(lock, f, indent=2, sort_keys=True)
+            os.replace(lock_path + ".tmp", lock_path)
+        return prompt
+
+    def verify(self):
+        """(path, problem) for every cached/bundled file that fails the checks."""
+        problems = []
+        for directory in (self.cache_dir, self.bundled_dir):
+            if not os.path.isdir(directory):
+                continue
+            for filename in sorted(os.listdir(directory)):
+                if not filename.endswith(".json") or filename in (LOCK_NAME, os.path.basename(self.lock_path)):
+                    continue
+                path = os.path.join(directory, filename)
+                name = filename[:-5].replace("__", "/")
+                ref = name.replace("@", ":", 1)
+                try:
+                    self._read(path, ref)
+                except (ValueError, KeyError) as e:
+                    problems.append((path, str(e)))
+        return problems
+
+
+_default = None
+
+
+def load_prompt(ref, **kwargs):
+    """`hub.pull` replacement reading the local registry (see module docstring)."""
+    global _default
+    if kwargs:
+        return PromptRegistry(**kwargs).load(ref)
+    if _default is None:
+        _default = PromptRegistry()
+    return _default.load(ref)
+
+
+if __name__ == "__main__":
+    command, refs = sys.argv[1], sys.argv[2:]
+    bundle = "--bundle" in refs
+    refs = [ref for ref in refs if ref != "--bundle"]
+    registry = PromptRegistry(allow_network=True)
+    if command == "pull":
+        for ref in refs:
+            registry.pull(ref, bundle=bundle)
+            print("pulled", ref)
+    elif command == "verify":
+        problems = registry.verify()
+        for path, problem in problems:
+            print(path, problem)
+        print("ok" if not problems else f"{len(problems)} problem(s)")
+        sys.exit(1 if problems else 0)
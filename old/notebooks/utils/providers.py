@@ -0,0 +1,169 @@
+"""
+Chat models and search backends picked by name, imported on first use.
+
+The entry scripts imported every provider at the top (`langchain_openai`,
+`langchain_google_genai`, `serpapi`, `googlesearch`, ...) whether the run
+used it or not. Here a backend's package is imported when the backend is first
+asked for, and the result is kept, so later calls are a dict lookup.
+
+    from providers import chat_model, lazy, search_backend
+
+    llm = chat_model("openai", model="gpt-4o-mini")
+    llm = chat_model(model="llama3.2")                 # backend from LLM_BACKEND=ollama, else "openai"
+    web_search = search_backend("googlesearch")        # search_backend() reads SEARCH_BACKEND=serpapi
+    web_search("langchain agents", num_results=3)      # -> list of urls
+    wiki = search_backend("wikipedia")
+    wiki("Nepal", sentences=2)                         # -> summary text
+
+    @lazy
+    def build_agent():                 # langchain imports inside, built once on first call
+        from langchain.agents import AgentExecutor
+        ...
+    build_agent.warm()                 # or start building now on a background thread
+
+New backends: `@register("search", "duckduckgo")` on a factory returning the callable.
+Import costs per script: `python notebooks/utils/bench_import_time.py`.
+"""
+import json
+import os
+import threading
+
+DEFAULTS = {"chat_model": "openai", "search": "googlesearch"}
+ENV_VARS = {"chat_model": "LLM_BACKEND", "search": "SEARCH_BACKEND"}
+
+_factories = {}  # kind -> {name: factory}
+_instances = {}
+_building = {}  # key -> lock held while that backend is built
+_lock = threading.Lock()  # only around the two dicts, never while a factory imports
+
+
+def lazy(build):
+    """
+    Builds once, on first call, from whichever thread gets there first.
+    `get.warm()` starts the build on a background thread, e.g. while the user
+    types the first question; an error there is raised again by the next call.
+    """
+    lock = threading.Lock()
+    built = []
+
+    def get():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(build())
+        return built[0]
+
+    def warm():
+        def run():
+            try:
+                get()
+            except Exception:
+                pass  # not built: the next get() retries and raises in the caller's thread
+
+        threading.Thread(target=run, name=f"warm-{build.__name__}", daemon=True).start()
+        return get
+
+    get.warm = warm
+    return get
+
+
+def register(kind, name):
+    def decorator(factory):
+        _factories.setdefault(kind, {})[name] = factory
+        return factory
+
+    return decorator
+
+
+def available(kind):
+    return sorted(_factories.get(kind, {}))
+
+
+def get(kind, name=None, **kwargs):
+    """Backend `name` of `kind` (default: its ENV_VARS env var, then DEFAULTS), built once per arguments."""
+    name = name or os.environ.get(ENV_VARS.get(kind, "")) or DEFAULTS[kind]
+    try:
+        factory = _factories[kind][name]
+    except KeyError:
+        raise ValueError(f"unknown {kind} backend {name!r}, available: {available(kind)}") from None
+    # json, not a tuple of the items: values like model_kwargs={...} are not hashable
+    key = (kind, name, json.dumps(kwargs, sort_keys=True, default=repr))
+    instance = _instances.get(key)
+    if instance is not None:
+        return instance
+    with _lock:
+        building = _building.setdefault(key, threading.Lock())
+    # a factory may take a second to import its package: other backends do not wait for it
+    with building:
+        instance = _instances.get(key)
+        if instance is None:
+            instance = _instances[key] = factory(**kwargs)
+    return instance
+
+
+def chat_model(name=None, **kwargs):
+    return get("chat_model", name, **kwargs)
+
+
+def search_backend(name=None):
+    return get("search", name)
+
+
+#--------------------------------------------
+# chat models
+#--------------------------------------------
+
+@register("chat_model", "openai")
+def _openai(**kwargs):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(**kwargs)
+
+
+@register("chat_model", "google")
+def _google(**kwargs):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(**kwargs)
+
+
+@register("chat_model", "ollama")
+def _ollama(**kwargs):
+    from langchain_ollama import ChatOllama
+
+    return ChatOllama(**kwargs)
+
+
+#--------------------------------------------
+# search
+#--------------------------------------------
+
+@register("search", "googlesearch")
+def _googlesearch():
+    from googlesearch import search
+
+    def web_search(query, num_results=3):
+        return [url for url in search(query, num_results=num_results) if url.strip()]
+
+    return web_search
+
+
+@register("search", "serpapi")
+def _serpapi():
+    from serpapi import GoogleSearch
+
+    def web_search(query, num_results=3):
+        results = GoogleSearch({"q": query, "num": num_results, "api_key": os.environ.get("SERP_API_KEY")}).get_dict()
+        return [r["link"] for r in results.get("organic_results", [])[:num_results]]
+
+    return web_search
+
+
+@register("search", "wikipedia")
+def _wikipedia():
+    from wikipedia import summary
+
+    def wiki_search(query, sentences=2):
+        return summary(query, sentences=sentences)
+
+    return wiki_search
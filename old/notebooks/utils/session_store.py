@@ -0,0 +1,143 @@
+"""
+Append-only chat message store, one sqlite file shared by every UI process.
+
+Saving a message is one INSERT, whatever the length of the conversation
+(the shelve version re-pickled the whole history on every rerun). The file is
+in WAL mode with a busy timeout, so several Streamlit workers can read and
+append at the same time.
+
+    store = SessionStore("output/chat/sessions.sqlite")
+    store.append("default", "user", "hi")
+    store.load("default", limit=50)                   # latest 50, oldest first
+    store.load("default", limit=50, before=first_id)  # the page before that
+    store.compact(keep_last=500)                      # drop old messages, shrink the file
+    store.import_shelve("chat_history")               # history of the shelve version, once
+"""
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+
+class SessionStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+            "role TEXT NOT NULL, content TEXT NOT NULL, created REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages(session_id, id)")
+
+    def _conn(self):
+        # one connection per thread, sqlite connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, session_id, role, content):
+        """Stores one message, returns its id."""
+        cur = self._conn().execute(
+            "INSERT INTO messages (session_id, role, content, created) VALUES (?, ?, ?, ?)",
+            (session_id, role, content, time.time()))
+        return cur.lastrowid
+
+    def append_many(self, session_id, messages):
+        """`messages`: dicts with role/content (the `st.session_state.messages` format)."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO messages (session_id, role, content, created) VALUES (?, ?, ?, ?)",
+                [(session_id, m["role"], m["content"], now) for m in messages])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def import_shelve(self, path, session_id="default"):
+        """
+        Moves the messages the shelve version kept in `path` into `session_id`, older
+        than anything stored, and renames its files to `*.imported` so the next start
+        does not import them again. Returns the number of messages imported.
+        """
+        import dbm
+        import shelve
+
+        if not dbm.whichdb(path):  # no shelve there (None) or not one dbm can open ("")
+            return 0
+        files = [name for name in glob.glob(glob.escape(path)) + glob.glob(glob.escape(path) + ".*")
+                 if not name.endswith(".imported")]  # chat_history, chat_history.db / .dat / .dir / .bak
+        with shelve.open(path, flag="r") as db:
+            messages = db.get("messages", [])
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # ids below the smallest one: load() pages by id, so these come first
+            first = conn.execute("SELECT COALESCE(MIN(id), 1) FROM messages").fetchone()[0]
+            created = max(os.path.getmtime(name) for name in files)
+            conn.executemany(
+                "INSERT INTO messages (id, session_id, role, content, created) VALUES (?, ?, ?, ?, ?)",
+                [(first - len(messages) + n, session_id, m["role"], m["content"], created)
+                 for n, m in enumerate(messages)])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        for name in files:
+            os.replace(name, name + ".imported")
+        return len(messages)
+
+    def load(self, session_id, limit=100, before=None):
+        """Latest `limit` messages (older than id `before`), oldest first."""
+        rows = self._conn().execute(
+            "SELECT id, role, content FROM messages WHERE session_id = ? AND id < ? "
+            "ORDER BY id DESC LIMIT ?",
+            (session_id, before if before is not None else 2 ** 63 - 1, limit)).fetchall()
+        return [{"id": id, "role": role, "content": content} for id, role, content in reversed(rows)]
+
+    def count(self, session_id):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def sessions(self):
+        """Session ids, most recently active first."""
+        rows = self._conn().execute(
+            "SELECT session_id FROM messages GROUP BY session_id ORDER BY MAX(id) DESC").fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, session_id):
+        self._conn().execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def compact(self, keep_last=None, older_than=None, vacuum=False):
+        """
+        Drops all but the latest `keep_last` messages of every session and/or
+        messages older than `older_than` seconds, then truncates the WAL file.
+        vacuum: also rebuild the database file (locks it while running)
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if keep_last is not None:
+                conn.execute(
+                    "DELETE FROM messages WHERE id IN ("
+                    "SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+                    "(PARTITION BY session_id ORDER BY id DESC) AS n FROM messages) WHERE n > ?)",
+                    (keep_last,))
+            if older_than is not None:
+                conn.execute("DELETE FROM messages WHERE created < ?", (time.time() - older_than,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if vacuum:
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
@@ -0,0 +1,285 @@
+"""
+Latency metrics for streamed generations.
+
+Per call: time to first token (ttft), the gaps between tokens, decode speed
+(tokens/sec after the first token) and total time. Calls are aggregated per
+model into fixed bucket histograms, exportable as JSON or Prometheus text.
+
+    metrics = StreamMetrics()
+    for chunk in metrics.measure(model.stream(messages), model="phi3.5"):
+        print(chunk.content, end="", flush=True)
+
+    # or as a callback, e.g. for chains / ainvoke
+    chain.invoke(inputs, config={"callbacks": [metrics.callback()]})
+
+    print(metrics.summary())
+    open("output/metrics.prom", "w").write(metrics.to_prometheus())
+
+Bookkeeping is a `perf_counter()` and a list append per chunk, the rest is
+done once per call when it ends; that part is timed too (`overhead_us`).
+"""
+import asyncio
+import bisect
+import json
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+GAP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def observe_many(self, values):
+        for value in values:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += len(values)
+        self.sum += sum(values)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the Prometheus approximation)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class _ModelStats:
+    def __init__(self):
+        self.ttft = Histogram(LATENCY_BUCKETS)
+        self.gap = Histogram(GAP_BUCKETS)
+        self.rate = Histogram(RATE_BUCKETS)
+        self.total = Histogram(LATENCY_BUCKETS)
+        self.tokens = 0
+        self.errors = 0
+        self.empty = 0  # ended without a token: stopped or cancelled before the first one
+        self.overhead = 0.0
+
+
+class Call:
+    """Timing of one streamed generation."""
+
+    __slots__ = ("metrics", "model", "start", "times", "tokens")
+
+    def __init__(self, metrics, model):
+        self.metrics = metrics
+        self.model = model
+        self.times = []
+        self.tokens = None  # token count reported by the model, if any
+        self.start = time.perf_counter()
+
+    def token(self):
+        self.times.append(time.perf_counter())
+
+    def finish(self, error=False):
+        self.metrics._record(self, time.perf_counter(), error)
+
+
+def _label(value):
+    """Prometheus label value: backslash, double quote and newline escaped."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class StreamMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def start(self, model="default"):
+        return Call(self, model)
+
+    def _record(self, call, end, error):
+        times = call.times
+        tokens = call.tokens or len(times)
+        with self._lock:
+            stats = self._models.get(call.model)
+            if stats is None:
+                stats = self._models[call.model] = _ModelStats()
+            if error:
+                stats.errors += 1
+            elif times:
+                stats.ttft.observe(times[0] - call.start)
+                stats.gap.observe_many([b - a for a, b in zip(times, times[1:])])
+                if tokens > 1 and end > times[0]:
+                    stats.rate.observe((tokens - 1) / (end - times[0]))
+                stats.total.observe(end - call.start)
+                stats.tokens += tokens
+            else:
+                stats.empty += 1
+            stats.overhead += time.perf_counter() - end
+
+    def measure(self, chunks, model="default"):
+        """Yields `chunks` (e.g. `model.stream(...)`) unchanged while timing them."""
+        call = self.start(model)
+        perf_counter = time.perf_counter
+        times = call.times
+        try:
+            for chunk in chunks:
+                times.append(perf_counter())
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage:
+                    call.tokens = usage.get("output_tokens") or call.tokens
+                yield chunk
+        except GeneratorExit:
+            # the consumer stopped early (break, client gone): a shorter call, not a failed one
+            call.finish()
+            raise
+        except BaseException:
+            call.finish(error=True)
+            raise
+        call.finish()
+
+    async def ameasure(self, chunks, model="default"):
+        call = self.start(model)
+        perf_counter = time.perf_counter
+        times = call.times
+        try:
+            async for chunk in chunks:
+                times.append(perf_counter())
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage:
+                    call.tokens = usage.get("output_tokens") or call.tokens
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            call.finish()  # stopped early or cancelled by a disconnect, see measure
+            raise
+        except BaseException:
+            call.finish(error=True)
+            raise
+        call.finish()
+
+    def callback(self, model=None):
+        """Callback handler timing every streamed llm/chat model run it sees."""
+        return StreamMetricsCallback(self, model)
+
+    def to_dict(self):
+        with self._lock:
+            out = {}
+            for model, stats in self._models.items():
+                calls = stats.total.count + stats.errors + stats.empty
+                out[model] = {
+                    "calls": calls,
+                    "errors": stats.errors,
+                    "empty": stats.empty,
+                    "tokens": stats.tokens,
+                    "ttft_seconds": stats.ttft.to_dict(),
+                    "inter_token_seconds": stats.gap.to_dict(),
+                    "tokens_per_second": stats.rate.to_dict(),
+                    "total_seconds": stats.total.to_dict(),
+                    "overhead_us": stats.overhead / calls * 1e6 if calls else None,
+                }
+            return out
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix="llm_stream"):
+        lines = []
+        with self._lock:
+            models = [(_label(model), stats) for model, stats in self._models.items()]
+            for name, attr, help in (("ttft_seconds", "ttft", "time to first token"),
+                                     ("inter_token_seconds", "gap", "time between streamed tokens"),
+                                     ("tokens_per_second", "rate", "decode speed after the first token"),
+                                     ("total_seconds", "total", "time of the whole generation")):
+                metric = f"{prefix}_{name}"
+                lines += [f"# HELP {metric} {help}", f"# TYPE {metric} histogram"]
+                for model, stats in models:
+                    hist = getattr(stats, attr)
+                    cumulative = 0
+                    for bound, count in zip([str(b) for b in hist.buckets] + ["+Inf"], hist.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{model="{model}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{model="{model}"}} {hist.sum}')
+                    lines.append(f'{metric}_count{{model="{model}"}} {hist.count}')
+            for name, attr, help in (("tokens_total", "tokens", "generated tokens"),
+                                     ("errors_total", "errors", "failed generations"),
+                                     ("empty_total", "empty", "generations stopped before their first token")):
+                metric = f"{prefix}_{name}"
+                lines += [f"# HELP {metric} {help}", f"# TYPE {metric} counter"]
+                lines += [f'{metric}{{model="{model}"}} {getattr(stats, attr)}' for model, stats in models]
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One line per model: ttft / tokens per second / total, p50 and p95."""
+        def fmt(hist, unit):
+            return f"p50 {hist['p50']}{unit} p95 {hist['p95']}{unit}"
+
+        return "\n".join(
+            f"{model}: {s['calls']} calls, ttft {fmt(s['ttft_seconds'], 's')}, "
+            f"{fmt(s['tokens_per_second'], ' tok/s')}, total {fmt(s['total_seconds'], 's')}, "
+            f"overhead {s['overhead_us']:.1f}us/call"
+            for model, s in self.to_dict().items())
+
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+
+
+class StreamMetricsCallback(BaseCallbackHandler):
+    """Times runs from the `on_llm_new_token` callbacks (only fired while streaming)."""
+
+    def __init__(self, metrics, model=None):
+        self.metrics = metrics
+        self.model = model
+        self._calls = {}
+
+    def _start(self, serialized, run_id, kwargs):
+        model = self.model
+        if model is None:
+            params = kwargs.get("invocation_params") or {}
+            model = params.get("model") or params.get("model_name") or (serialized or {}).get("name", "default")
+        self._calls[run_id] = self.metrics.start(model)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(serialized, run_id, kwargs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(serialized, run_id, kwargs)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        call = self._calls.get(run_id)
+        if call is not None:
+            call.token()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        call.tokens = usage.get("completion_tokens")
+        if call.times:  # not streamed: nothing to time token by token
+            call.finish()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        call = self._calls.pop(run_id, None)
+        if call is not None:
+            call.finish(error=True)
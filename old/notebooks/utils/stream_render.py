@@ -0,0 +1,81 @@
+"""
+Throttled rendering of streamed tokens.
+
+Re-rendering the whole answer on every token is O(n²) work for long answers
+(and in Streamlit one websocket message per token). `StreamRenderer` collects
+tokens and renders at most every `interval` seconds, or once `max_chars` new
+characters are waiting, plus a final render when the stream ends.
+
+    # streamlit: the placeholder gets the full text so far
+    placeholder = st.empty()
+    full_response = render_stream(model.stream(prompt), lambda text: placeholder.markdown(text), cursor="|")
+
+    # terminal: only the new part is printed
+    answer = render_stream(model.stream(messages), lambda new: print(new, end="", flush=True), delta=True)
+
+Benchmark: `python notebooks/utils/bench_stream_render.py`
+"""
+import time
+
+
+class StreamRenderer:
+    def __init__(self, render, interval=0.05, max_chars=None, delta=False, cursor=""):
+        """
+        render: called with the full text so far, or with the new text when `delta`
+        interval: seconds between renders (0.05 = 20 updates per second)
+        max_chars: render earlier once this many new characters are waiting
+        cursor: appended to intermediate full renders, e.g. "|" or "▌"
+        """
+        self.render = render
+        self.interval = interval
+        self.max_chars = max_chars
+        self.delta = delta
+        self.cursor = cursor
+        self.text = ""
+        self.renders = 0
+        self._pending = []
+        self._pending_chars = 0
+        self._last = 0.0
+
+    def write(self, token):
+        if not token:
+            return
+        self._pending.append(token)
+        self._pending_chars += len(token)
+        now = time.monotonic()
+        if now - self._last >= self.interval or (self.max_chars and self._pending_chars >= self.max_chars):
+            self._flush(now)
+
+    def _flush(self, now, final=False):
+        new = "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        self._last = now
+        self.text += new
+        if self.delta:
+            if new:
+                self.render(new)
+                self.renders += 1
+        else:
+            self.render(self.text if final else self.text + self.cursor)
+            self.renders += 1
+
+    def close(self):
+        """Renders what is left (full mode: without the cursor) and returns the whole text."""
+        self._flush(time.monotonic(), final=True)
+        return self.text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def render_stream(chunks, render, **kwargs):
+    """Feeds `chunks` (strings or message chunks) through a `StreamRenderer`, returns the full text."""
+    renderer = StreamRenderer(render, **kwargs)
+    with renderer:
+        for chunk in chunks:
+            renderer.write(getattr(chunk, "content", chunk))
+    return renderer.text